@@ -1,68 +1,92 @@
+import os
+import time
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, ClientsideFunction, Input, Output, State
 import dash_bootstrap_components as dbc
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import psycopg2
-import psycopg2.sql as sql
-import datetime
 import dash_bootstrap_templates as dbt
-
-# --- Database Connection Parameters ---
-db_connection_params = {
-    "dbname": "beatbnk_db",
-    "user": "user",
-    "password": "X1SOrzeSrk",
-    "host": "beatbnk-db-green-0j3yjq.cdgq4essi2q1.ap-southeast-2.rds.amazonaws.com",
-    "port": "5432"
-}
-
-tables_to_query = [
-    "SequelizeMeta", "attendees", "categories", "category_mappings",
-    "event_tickets", "events", "follows", "genres", "group_permissions",
-    "groups", "interests", "media_files", "media_types",
-    "mpesa_stk_push_payments", "otps", "performer_genres",
-    "performer_tip_payments", "performer_tips", "performers",
-    "permissions", "refresh_tokens", "song_request_payments",
-    "song_requests", "tickets", "user_fcm_tokens", "user_groups",
-    "user_interests", "user_venue_bookings", "users", "venue_bookings",
-    "venues"
-]
+from flask import Response, jsonify, request
+
+from change_feed import REFRESH_MODE, ChangeFeed
+from database import IncrementalSync, db_connection_params, tables_to_query
+from manifest import charts_reading, required_columns, required_tables
+from charts import CHARTS, KPIS, ZOOMABLE_CHARTS, loading_figure
+from downsampling import window_from_relayout, window_key
+from figure_cache import FigureCache, cache_key
+from instrumentation import PROFILE_REFRESH_PATH, PROMETHEUS_CONTENT_TYPE, REGISTRY, RefreshProfiler
+from metrics import METRICS_BACKEND, compute_pandas_metrics, fetch_sql_metrics
+from rollups import QUERY_METRICS, applicable_filters, filter_key, filters_from_controls, rollup_index, rollup_inputs
+from scheduler import REFRESH_INTERVAL_SECONDS, ChangeFeedScheduler, RefreshScheduler
+from snapshot_store import SnapshotStore, input_hashes
+
+# Browsers only check whether a new snapshot version exists, so they can poll often.
+# In change-feed mode new versions are pushed instead, and polling only runs
+# while the browser's event stream is disconnected.
+CLIENT_POLL_SECONDS = 15
+
+# --- Snapshot Push Settings (change-feed mode) ---
+# How often each open event stream checks this worker's snapshot version.
+PUSH_CHECK_SECONDS = 0.5
+# A comment is sent this often on idle streams so proxies keep them open.
+PUSH_KEEPALIVE_SECONDS = 15
+# Streams are closed after this long (the browser reconnects), so dead clients are let go.
+PUSH_STREAM_SECONDS = 300
 
 # --- Global variable to store data (will be updated by interval) ---
-global_data = {}
+global_data = {}  # Raw tables, only synced when METRICS_BACKEND is "pandas"
+
+# Metrics snapshot shared by all workers; only one of them refreshes it per interval
+snapshot_store = SnapshotStore()
+
+# Built figures, shared with the other workers through the snapshot directory
+figure_cache = FigureCache(os.path.join(snapshot_store.directory, "figures"))
+
+# Keeps per-table high-water marks so refreshes only fetch changed rows, and
+# loads only the tables and columns the charts declare in manifest.py
+data_sync = IncrementalSync(db_connection_params, required_tables(tables_to_query),
+                            columns=required_columns())
+
 
-def fetch_data_from_db(db_params, table_names):
+def metrics_reading(table_names):
+    """Metrics of the KPIs and charts that read any of table_names, including the rollups they filter."""
+    components = {**KPIS, **CHARTS}
+    names = []
+    for component_id in charts_reading(table_names):
+        metric_names = components[component_id][0]
+        names.extend(name for name in [*metric_names, *rollup_inputs(metric_names)] if name not in names)
+    return names
+
+
+def refresh_metrics(table_names=None):
     """
-    Connects to DB, fetches all records and their column names for specified tables.
-    Returns a dictionary of pandas DataFrames.
+    Recomputes every metric with the configured backend or, given table_names,
+    only the metrics that read those tables.
+    "sql" runs the aggregates in the database; "pandas" syncs the tables first.
     """
-    connection = None
-    data_frames = {}
-    try:
-        connection = psycopg2.connect(**db_params)
-        with connection.cursor() as cursor:
-            for table_name in table_names:
-                try:
-                    query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
-                    cursor.execute(query)
-                    columns = [desc[0] for desc in cursor.description]
-                    records = cursor.fetchall()
-                    data_frames[table_name] = pd.DataFrame(records, columns=columns)
-                except (Exception, psycopg2.Error) as error:
-                    print(f"Error fetching from table '{table_name}': {error}")
-                    data_frames[table_name] = pd.DataFrame() # Empty DataFrame on error
-    except (Exception, psycopg2.DatabaseError) as error:
-        print(f"A critical database error occurred: {error}")
-    finally:
-        if connection is not None:
-            connection.close()
-    return data_frames
-
-# Initialize data on application startup
-global_data = fetch_data_from_db(db_connection_params, tables_to_query)
-print("Initial data fetched successfully.")
+    global global_data
+    metric_names = None if table_names is None else metrics_reading(table_names)
+    with REGISTRY.timer("dashboard_refresh_seconds", backend=METRICS_BACKEND):
+        if METRICS_BACKEND == "pandas":
+            global_data = data_sync.refresh(table_names)
+            return compute_pandas_metrics(global_data, metric_names)
+        return fetch_sql_metrics(db_connection_params, metric_names)
+
+
+# Warm-start from the last snapshot on disk, if any. Startup never waits for the
+# database: the scheduler loads fresh data in the background and the charts show
+# placeholders until the first snapshot is available.
+if snapshot_store.load():
+    print(f"Warm-started from snapshot v{snapshot_store.version} ({snapshot_store.age():.0f}s old).")
+
+# Refresh on a server-side schedule instead of inside browser-driven callbacks
+# With DASHBOARD_PROFILE_REFRESH set, the first refresh cycle is profiled with cProfile
+refresh = RefreshProfiler(refresh_metrics, PROFILE_REFRESH_PATH) if PROFILE_REFRESH_PATH else refresh_metrics
+if REFRESH_MODE == "change-feed":
+    # Refresh only what changed, as soon as one worker's feed connection sees it
+    change_feed = ChangeFeed(db_connection_params, required_tables(tables_to_query))
+    refresh_scheduler = ChangeFeedScheduler(snapshot_store, refresh, change_feed)
+else:
+    refresh_scheduler = RefreshScheduler(snapshot_store, refresh, interval=REFRESH_INTERVAL_SECONDS)
+refresh_scheduler.start()
 
 # --- Dash App Setup ---
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.VAPOR, dbc.icons.FONT_AWESOME])
@@ -73,6 +97,62 @@ server = app.server
 # Apply a Bootstrap template
 dbt.load_figure_template("flatly")
 
+
+# --- Health Checks ---
+@server.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify(status="ok")
+
+
+@server.route('/readyz')
+def readyz():
+    """Readiness: 200 once a data snapshot is loaded, 503 before, so the load balancer can wait for it."""
+    ready = snapshot_store.version > 0
+    body = jsonify(ready=ready, snapshot_version=snapshot_store.version,
+                   snapshot_age_seconds=snapshot_store.age() if ready else None)
+    return body, (200 if ready else 503)
+
+
+@server.route('/metrics')
+def prometheus_metrics():
+    """Timings, sizes and cache counters of this worker in the Prometheus text format."""
+    REGISTRY.set("dashboard_snapshot_version", snapshot_store.version)
+    if snapshot_store.version > 0:
+        REGISTRY.set("dashboard_snapshot_age_seconds", snapshot_store.age())
+    REGISTRY.set("dashboard_figure_cache_hits_total", figure_cache.hits)
+    REGISTRY.set("dashboard_figure_cache_misses_total", figure_cache.misses)
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@server.route('/snapshot-events')
+def snapshot_events():
+    """
+    Server-sent events: pushes this worker's snapshot version to the browser
+    whenever it changes. Each open stream holds a server thread, so streams
+    are only served by threaded or async workers (see REFRESH_MODE).
+    """
+    if not request.environ.get('wsgi.multithread'):
+        # A stream would block a whole sync worker. 204 tells the browser not to
+        # reconnect, and it keeps polling with dcc.Interval instead.
+        return Response(status=204)
+
+    def stream():
+        shown_version = None
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < PUSH_STREAM_SECONDS:
+            version = snapshot_store.version
+            if version != shown_version:
+                shown_version, last_sent = version, time.monotonic()
+                yield f"event: snapshot\ndata: {version}\n\n"
+            elif time.monotonic() - last_sent >= PUSH_KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(PUSH_CHECK_SECONDS)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # --- Layout Components ---
 
 # The main dashboard layout
@@ -80,6 +160,15 @@ dashboard_layout = html.Div([
     html.H1("BeatBnk Data Insights Dashboard", className="mb-4 text-center text-primary"),
     html.Hr(className="my-4"),
 
+    # Filters Row (applied to every KPI and chart they are relevant to)
+    dbc.Row([
+        dbc.Col(dcc.DatePickerRange(id='filter-date', clearable=True,
+                                    start_date_placeholder_text="Created from",
+                                    end_date_placeholder_text="Created until"), md=4),
+        dbc.Col(dcc.Dropdown(id='filter-category', multi=True, placeholder="All categories"), md=4),
+        dbc.Col(dcc.Dropdown(id='filter-venue', multi=True, placeholder="All venues"), md=4),
+    ], className="mb-4"),
+
     # KPIs Row
     dbc.Row([
         dbc.Col(dbc.Card(dbc.CardBody([
@@ -128,9 +217,15 @@ app.layout = html.Div([
     dcc.Location(id='url', refresh=False), # Keep dcc.Location for internal Dash workings, but no routing logic
     dcc.Interval(
         id='interval-component',
-        interval=60*1000, # in milliseconds (60 seconds)
+        interval=CLIENT_POLL_SECONDS*1000, # in milliseconds
         n_intervals=0
     ),
+    dcc.Store(id='snapshot-version'), # Snapshot version this browser is currently showing
+    dcc.Store(id='snapshot-push'), # Latest snapshot version pushed over /snapshot-events
+    # Input key each KPI and chart is currently showing, so unchanged ones are not re-sent
+    *[dcc.Store(id=f'{component_id}-shown') for component_id in [*KPIS, *CHARTS]],
+    # X range each time series chart is zoomed to (None: everything)
+    *[dcc.Store(id=f'{chart_id}-window') for chart_id in ZOOMABLE_CHARTS],
     dbc.Toast(
         "Data refreshed successfully!",
         id="data-refresh-toast",
@@ -145,260 +240,143 @@ app.layout = html.Div([
 ])
 
 # --- Callbacks for Data Refresh ---
+if REFRESH_MODE == "change-feed":
+    # Opens the browser's event stream once the page has loaded (assets/change_feed.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='change_feed', function_name='listen'),
+        Output('snapshot-push', 'data'),
+        Input('url', 'pathname')
+    )
+
+
 @app.callback(
     Output('data-refresh-toast', 'is_open'),
-    Output('interval-component', 'n_intervals'), # Reset interval count to avoid overflow
-    Input('interval-component', 'n_intervals')
+    Output('snapshot-version', 'data'),
+    Input('interval-component', 'n_intervals'),
+    Input('snapshot-push', 'data'),
+    State('snapshot-version', 'data')
 )
-def refresh_data(n):
-    global global_data
-    if n > 0: # Avoid refreshing on initial load (it's already done)
-        print(f"Refreshing data at {datetime.datetime.now()}...")
-        global_data = fetch_data_from_db(db_connection_params, tables_to_query)
-        print("Data refreshed.")
-        return True, 0 # Open toast, reset interval count
-    return False, 0 # Don't open toast on initial load, reset interval count
-
-
-# --- Callback for Dashboard KPIs and All 10 Graphs ---
+def refresh_data(n, pushed_version, shown_version):
+    # The refresh scheduler keeps snapshot_store current; this only checks for a new version
+    with REGISTRY.timer("dashboard_callback_seconds", callback='snapshot-version'):
+        if pushed_version is not None and pushed_version > snapshot_store.version:
+            snapshot_store.load()  # Pushed by a worker that loaded the new version before this one
+        version = snapshot_store.version
+        if version == shown_version:
+            REGISTRY.inc("dashboard_callback_unchanged_total", callback='snapshot-version')
+            return dash.no_update, dash.no_update # Nothing new, leave the charts alone
+        # Don't open the toast on initial load
+        return shown_version is not None, version
+
+
+# --- Callbacks for Filter Options ---
 @app.callback(
-    [Output('kpi-total-events', 'children'),
-     Output('kpi-total-users', 'children'),
-     Output('kpi-total-performers', 'children'),
-     Output('kpi-total-tips', 'children'),
-     Output('event-status-pie', 'figure'),
-     Output('new-users-line', 'figure'),
-     Output('event-ticket-sales', 'figure'),
-     Output('event-price-distribution', 'figure'),
-     Output('total-tips-over-time', 'figure'),
-     Output('top-tipped-performers', 'figure'),
-     Output('total-transactions-over-time', 'figure'),
-     Output('events-by-category', 'figure'),
-     Output('users-by-registration-month', 'figure'),
-     Output('venue-booking-status-pie', 'figure')],
-    [Input('interval-component', 'n_intervals')] # Trigger on interval
+    Output('filter-category', 'options'),
+    Output('filter-venue', 'options'),
+    Input('snapshot-version', 'data')
 )
-def update_dashboard_visualizations(n):
-    # Access global_data (already refreshed by the interval callback)
-    events_df = global_data.get('events', pd.DataFrame()).copy()
-    users_df = global_data.get('users', pd.DataFrame()).copy()
-    performers_df = global_data.get('performers', pd.DataFrame()).copy()
-    performer_tips_df = global_data.get('performer_tips', pd.DataFrame()).copy()
-    event_tickets_df = global_data.get('event_tickets', pd.DataFrame()).copy()
-    categories_df = global_data.get('categories', pd.DataFrame()).copy()
-    category_mappings_df = global_data.get('category_mappings', pd.DataFrame()).copy()
-    mpesa_payments_df = global_data.get('mpesa_stk_push_payments', pd.DataFrame()).copy()
-    venue_bookings_df = global_data.get('venue_bookings', pd.DataFrame()).copy()
-
-
-    # --- KPIs ---
-    total_events = len(events_df)
-    total_users = len(users_df)
-    total_performers = len(performers_df)
-    total_tips = performer_tips_df['tipAmount'].sum() if not performer_tips_df.empty and 'tipAmount' in performer_tips_df.columns else 0
-
-    # --- 10 Visualizations ---
-
-    # 1. Event Status Distribution (Pie Chart)
-    event_status_fig = go.Figure()
-    if not events_df.empty and 'eventStatus' in events_df.columns:
-        status_counts = events_df['eventStatus'].value_counts().reset_index()
-        status_counts.columns = ['Status', 'Count']
-        event_status_fig = px.pie(status_counts, values='Count', names='Status',
-                                   title='Distribution of Event Status', hole=0.3)
-    else:
-        event_status_fig.add_annotation(text="No event status data available.",
-                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        event_status_fig.update_layout(title='Distribution of Event Status', xaxis_visible=False, yaxis_visible=False)
-
-
-    # 2. New Users Registered Over Time (Line Chart)
-    new_users_fig = go.Figure()
-    if not users_df.empty and 'createdAt' in users_df.columns:
-        users_df['registration_date'] = pd.to_datetime(users_df['createdAt']).dt.to_period('M')
-        monthly_users = users_df.groupby('registration_date').size().reset_index(name='count')
-        monthly_users['registration_date'] = monthly_users['registration_date'].astype(str)
-        new_users_fig = px.line(monthly_users, x='registration_date', y='count',
-                                title='New Users Registered Over Time (Monthly)',
-                                labels={'registration_date': 'Month', 'count': 'New Users'})
-        new_users_fig.update_xaxes(type='category')
-    else:
-        new_users_fig.add_annotation(text="No user registration data available.",
-                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        new_users_fig.update_layout(title='New Users Registered Over Time (Monthly)', xaxis_visible=False, yaxis_visible=False)
-
-    # 3. Top 10 Events by Tickets Sold (Bar Chart)
-    event_ticket_sales_fig = go.Figure()
-    # MODIFIED: Added 'eventName' check to events_df
-    if (not events_df.empty and 'eventName' in events_df.columns and
-        not event_tickets_df.empty and 'totalTickets' in event_tickets_df.columns and 'availableTickets' in event_tickets_df.columns):
-        events_with_tickets_df = pd.merge(events_df, event_tickets_df, left_on='id', right_on='eventId', how='left', suffixes=('_event', '_ticket'))
-        # Ensure eventName_event column exists after merge, especially if merge resulted in empty dataframe
-        if 'eventName_event' in events_with_tickets_df.columns and not events_with_tickets_df.empty:
-            events_with_tickets_df['tickets_sold'] = events_with_tickets_df['totalTickets'] - events_with_tickets_df['availableTickets']
-            sales_by_event = events_with_tickets_df.groupby('eventName_event')['tickets_sold'].sum().reset_index()
-            sales_by_event = sales_by_event.sort_values(by='tickets_sold', ascending=False).head(10)
-            event_ticket_sales_fig = px.bar(sales_by_event, x='eventName_event', y='tickets_sold',
-                                            title='Top 10 Events by Tickets Sold',
-                                            labels={'eventName_event': 'Event Name', 'tickets_sold': 'Tickets Sold'})
-        else:
-            event_ticket_sales_fig.add_annotation(text="Merged event data missing 'eventName_event' or is empty.",
-                                                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-            event_ticket_sales_fig.update_layout(title='Top 10 Events by Tickets Sold', xaxis_visible=False, yaxis_visible=False)
-    else:
-        event_ticket_sales_fig.add_annotation(text="Required data for ticket sales not available.",
-                                            xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        event_ticket_sales_fig.update_layout(title='Top 10 Events by Tickets Sold', xaxis_visible=False, yaxis_visible=False)
+def update_filter_options(version):
+    snapshot = snapshot_store.snapshot
+    if snapshot['version'] == 0:
+        return [], []
+    index = rollup_index(snapshot)
+    return (index.category_options(),
+            [{'label': label, 'value': venue_id} for venue_id, label in index.venue_options()])
+
+
+# Every KPI and chart is also redrawn when a filter that applies to it changes
+FILTER_INPUTS = [
+    Input('filter-date', 'start_date'),
+    Input('filter-date', 'end_date'),
+    Input('filter-category', 'value'),
+    Input('filter-venue', 'value'),
+]
 
 
-    # 4. Distribution of Event Ticket Prices (Histogram)
-    price_dist_fig = go.Figure()
-    if not event_tickets_df.empty and 'price' in event_tickets_df.columns:
-        price_dist_fig = px.histogram(event_tickets_df, x='price', nbins=20,
-                                      title='Distribution of Event Ticket Prices',
-                                      labels={'price': 'Ticket Price (KSH)', 'count': 'Number of Tickets'})
-    else:
-        price_dist_fig.add_annotation(text="No ticket price data available.",
-                                      xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        price_dist_fig.update_layout(title='Distribution of Event Ticket Prices', xaxis_visible=False, yaxis_visible=False)
-
-
-    # 5. Total Tips Amount Over Time (Line Chart)
-    total_tips_over_time_fig = go.Figure()
-    if not performer_tips_df.empty and 'createdAt' in performer_tips_df.columns and 'tipAmount' in performer_tips_df.columns:
-        performer_tips_df['tip_date'] = pd.to_datetime(performer_tips_df['createdAt']).dt.date
-        daily_tips = performer_tips_df.groupby('tip_date')['tipAmount'].sum().reset_index()
-        total_tips_over_time_fig = px.line(daily_tips, x='tip_date', y='tipAmount',
-                                           title='Total Tips Amount Over Time',
-                                           labels={'tip_date': 'Date', 'tipAmount': 'Total Tip Amount (KSH)'})
-    else:
-        total_tips_over_time_fig.add_annotation(text="No tips data available.",
-                                                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        total_tips_over_time_fig.update_layout(title='Total Tips Amount Over Time', xaxis_visible=False, yaxis_visible=False)
-
-    # 6. Top 10 Tipped Performers (Bar Chart)
-    top_tipped_performers_fig = go.Figure()
-    if not performer_tips_df.empty and not performers_df.empty and 'performerId' in performer_tips_df.columns and 'tipAmount' in performer_tips_df.columns:
-        # Merge to get performer's user ID, then user's email for name
-        performer_tips_merged = pd.merge(performer_tips_df, performers_df[['id', 'userId']], left_on='performerId', right_on='id', how='left')
-        if not users_df.empty and 'userId' in performer_tips_merged.columns:
-            # Check if 'email' column exists in users_df before attempting to use it
-            if 'email' in users_df.columns:
-                user_emails = users_df.set_index('id')['email'].to_dict()
-                performer_tips_merged['performer_email'] = performer_tips_merged['userId'].map(user_emails).fillna('Unknown User')
-                # Ensure 'performer_email' column exists and is not all 'Unknown User' before grouping
-                if 'performer_email' in performer_tips_merged.columns and not performer_tips_merged['performer_email'].eq('Unknown User').all():
-                    tips_by_performer = performer_tips_merged.groupby('performer_email')['tipAmount'].sum().reset_index()
-                    tips_by_performer = tips_by_performer.sort_values(by='tipAmount', ascending=False).head(10)
-                    top_tipped_performers_fig = px.bar(tips_by_performer, x='performer_email', y='tipAmount',
-                                                       title='Top 10 Tipped Performers (by Email)',
-                                                       labels={'performer_email': 'Performer Email', 'tipAmount': 'Total Tip Amount (KSH)'})
-                else:
-                    top_tipped_performers_fig.add_annotation(text="Performer email data not suitable for grouping.",
-                                                            xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-                    top_tipped_performers_fig.update_layout(title='Top 10 Tipped Performers (by Email)', xaxis_visible=False, yaxis_visible=False)
-            else:
-                top_tipped_performers_fig.add_annotation(text="Users table missing 'email' column.",
-                                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-                top_tipped_performers_fig.update_layout(title='Top 10 Tipped Performers (by Email)', xaxis_visible=False, yaxis_visible=False)
-        else:
-            top_tipped_performers_fig.add_annotation(text="No user ID data for performer names or performer tips data missing.",
-                                                    xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-            top_tipped_performers_fig.update_layout(title='Top 10 Tipped Performers (by Email)', xaxis_visible=False, yaxis_visible=False)
-    else:
-        top_tipped_performers_fig.add_annotation(text="No performer tips or performer data available.",
-                                                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        top_tipped_performers_fig.update_layout(title='Top 10 Tipped Performers (by Email)', xaxis_visible=False, yaxis_visible=False)
-
-
-    # 7. Total Transaction Amount Over Time (Line Chart)
-    total_transactions_over_time_fig = go.Figure()
-    if not mpesa_payments_df.empty and 'createdAt' in mpesa_payments_df.columns and 'transactionAmount' in mpesa_payments_df.columns:
-        mpesa_payments_df['transaction_date'] = pd.to_datetime(mpesa_payments_df['createdAt']).dt.date
-        daily_transactions = mpesa_payments_df.groupby('transaction_date')['transactionAmount'].sum().reset_index()
-        total_transactions_over_time_fig = px.line(daily_transactions, x='transaction_date', y='transactionAmount',
-                                                    title='Total Transaction Amount Over Time (Mpesa STK Push)',
-                                                    labels={'transaction_date': 'Date', 'transactionAmount': 'Total Amount (KSH)'})
-    else:
-        total_transactions_over_time_fig.add_annotation(text="No Mpesa STK Push payments data available.",
-                                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        total_transactions_over_time_fig.update_layout(title='Total Transaction Amount Over Time (Mpesa STK Push)', xaxis_visible=False, yaxis_visible=False)
-
-
-    # 8. Events by Category (Bar Chart)
-    events_by_category_fig = go.Figure()
-    # MODIFIED: Added checks for 'name' in categories_df columns
-    if (not events_df.empty and not category_mappings_df.empty and
-        not categories_df.empty and 'name' in categories_df.columns):
-        events_categories = pd.merge(events_df, category_mappings_df, left_on='id', right_on='eventId', how='inner')
-        events_categories = pd.merge(events_categories, categories_df[['id', 'name']], left_on='categoryId', right_on='id', how='inner', suffixes=('_event', '_category'))
-        if 'name_category' in events_categories.columns: # Check if merge resulted in this column
-            events_categories.rename(columns={'name_category': 'categoryName'}, inplace=True)
-            if not events_categories.empty and 'categoryName' in events_categories.columns: # Ensure categoryName is present and not empty
-                category_counts = events_categories['categoryName'].value_counts().reset_index()
-                category_counts.columns = ['Category', 'Count']
-                events_by_category_fig = px.bar(category_counts, x='Category', y='Count',
-                                                title='Number of Events by Category',
-                                                labels={'Count': 'Number of Events'})
-            else:
-                events_by_category_fig.add_annotation(text="Category name data missing or empty after merge.",
-                                                      xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-                events_by_category_fig.update_layout(title='Number of Events by Category', xaxis_visible=False, yaxis_visible=False)
-        else:
-            events_by_category_fig.add_annotation(text="Category name column not found after merge.",
-                                                  xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-            events_by_category_fig.update_layout(title='Number of Events by Category', xaxis_visible=False, yaxis_visible=False)
-    else:
-        events_by_category_fig.add_annotation(text="Required data for events by category not available.",
-                                              xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        events_by_category_fig.update_layout(title='Number of Events by Category', xaxis_visible=False, yaxis_visible=False)
-
-
-    # 9. Users by Registration Month/Year (Bar Chart)
-    users_by_registration_month_fig = go.Figure()
-    if not users_df.empty and 'createdAt' in users_df.columns:
-        users_df['registration_month'] = pd.to_datetime(users_df['createdAt']).dt.to_period('M')
-        monthly_users_count = users_df.groupby('registration_month').size().reset_index(name='count')
-        monthly_users_count['registration_month'] = monthly_users_count['registration_month'].astype(str)
-        users_by_registration_month_fig = px.bar(monthly_users_count, x='registration_month', y='count',
-                                                  title='Users Registered by Month',
-                                                  labels={'registration_month': 'Registration Month', 'count': 'Number of Users'})
-        users_by_registration_month_fig.update_xaxes(type='category')
-    else:
-        users_by_registration_month_fig.add_annotation(text="No user registration data available.",
-                                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        users_by_registration_month_fig.update_layout(title='Users Registered by Month', xaxis_visible=False, yaxis_visible=False)
-
-
-    # 10. Venue Booking Status Distribution (Pie Chart)
-    venue_booking_status_fig = go.Figure()
-    if not venue_bookings_df.empty and 'bookingStatus' in venue_bookings_df.columns:
-        status_counts = venue_bookings_df['bookingStatus'].value_counts().reset_index()
-        status_counts.columns = ['Status', 'Count']
-        venue_booking_status_fig = px.pie(status_counts, values='Count', names='Status',
-                                           title='Distribution of Venue Booking Status', hole=0.3)
-    else:
-        venue_booking_status_fig.add_annotation(text="No venue booking status data available.",
-                                                xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
-        venue_booking_status_fig.update_layout(title='Distribution of Venue Booking Status', xaxis_visible=False, yaxis_visible=False)
-
-
-    return (
-        f"{total_events}",
-        f"{total_users}",
-        f"{total_performers}",
-        f"Ksh {total_tips:,.2f}",
-        event_status_fig,
-        new_users_fig,
-        event_ticket_sales_fig,
-        price_dist_fig,
-        total_tips_over_time_fig,
-        top_tipped_performers_fig,
-        total_transactions_over_time_fig,
-        events_by_category_fig,
-        users_by_registration_month_fig,
-        venue_booking_status_fig
+def component_inputs(snapshot, metric_names, filters):
+    """
+    Returns the content hashes a component is keyed on and a function returning
+    the metrics to build it from: the snapshot's all-time metrics or, if any
+    filter applies to the component, the same metrics answered from the
+    snapshot's rollups. Metrics queried from the database are keyed on the
+    snapshot version too, as no rollup hash changes with their tables.
+    """
+    active = applicable_filters(filters, metric_names)
+    if not active:
+        return input_hashes(snapshot, metric_names), lambda: snapshot['metrics']
+    hashes = [*input_hashes(snapshot, rollup_inputs(metric_names)), filter_key(active)]
+    if QUERY_METRICS.intersection(metric_names):
+        hashes.append(f"v{snapshot['version']}")
+    return hashes, lambda: rollup_index(snapshot).filtered_metrics(metric_names, active)
+
+
+# --- Callbacks for Dashboard KPIs and All 10 Graphs ---
+# Each KPI and chart has its own callback, so a slow or failing one does not
+# hold up the others and only components whose input metrics changed are re-sent.
+def register_component_callback(component_id, prop, metric_names, build, cache_figure):
+    @app.callback(
+        Output(component_id, prop),
+        Output(f'{component_id}-shown', 'data'),
+        Input('snapshot-version', 'data'), # Trigger when a new snapshot version is shown
+        *FILTER_INPUTS,
+        State(f'{component_id}-shown', 'data')
     )
+    def update_component(version, start_date, end_date, categories, venues, shown_key):
+        with REGISTRY.timer("dashboard_callback_seconds", callback=component_id):
+            # Access the latest snapshot (published by the refresh scheduler)
+            snapshot = snapshot_store.snapshot
+            if snapshot['version'] == 0:
+                # Nothing loaded yet; show a placeholder and render for real once data arrives
+                return (loading_figure() if cache_figure else "...", None)
+            filters = filters_from_controls(start_date, end_date, categories, venues)
+            hashes, metrics = component_inputs(snapshot, metric_names, filters)
+            key = cache_key(component_id, hashes)
+            if key == shown_key:
+                REGISTRY.inc("dashboard_callback_unchanged_total", callback=component_id)
+                return dash.no_update, dash.no_update # Input metrics and filters unchanged
+            if cache_figure:
+                # Figures are reused until the metrics they are drawn from change.
+                return figure_cache.get_or_build(component_id, hashes, lambda: build(metrics())), key
+            return build(metrics()), key
+
+
+# Time series charts are also redrawn when zoomed or panned: the server re-buckets
+# the visible range at a finer resolution instead of sending every point up front.
+def register_zoomable_chart_callback(chart_id, metric_names, build):
+    @app.callback(
+        Output(chart_id, 'figure'),
+        Output(f'{chart_id}-shown', 'data'),
+        Output(f'{chart_id}-window', 'data'),
+        Input('snapshot-version', 'data'),
+        Input(chart_id, 'relayoutData'),
+        *FILTER_INPUTS,
+        State(f'{chart_id}-shown', 'data'),
+        State(f'{chart_id}-window', 'data')
+    )
+    def update_chart(version, relayout, start_date, end_date, categories, venues, shown_key, window):
+        with REGISTRY.timer("dashboard_callback_seconds", callback=chart_id):
+            snapshot = snapshot_store.snapshot
+            if snapshot['version'] == 0:
+                return loading_figure(), None, window
+            window = window_from_relayout(relayout, window and tuple(window))
+            filters = filters_from_controls(start_date, end_date, categories, venues)
+            hashes, metrics = component_inputs(snapshot, metric_names, filters)
+            hashes.append(window_key(window))
+            key = cache_key(chart_id, hashes)
+            if key == shown_key:
+                REGISTRY.inc("dashboard_callback_unchanged_total", callback=chart_id)
+                return dash.no_update, dash.no_update, dash.no_update # Same data, same range
+            figure = figure_cache.get_or_build(chart_id, hashes, lambda: build(metrics(), window))
+            return figure, key, window
+
+
+for kpi_id, (metric_names, build) in KPIS.items():
+    register_component_callback(kpi_id, 'children', metric_names, build, cache_figure=False)
+for chart_id, (metric_names, build) in CHARTS.items():
+    if chart_id in ZOOMABLE_CHARTS:
+        register_zoomable_chart_callback(chart_id, metric_names, build)
+    else:
+        register_component_callback(chart_id, 'figure', metric_names, build, cache_figure=True)
 
 
 # --- Main execution ---
@@ -0,0 +1,26 @@
+// Change-feed mode: listens on the server's snapshot event stream (see
+// /snapshot-events in app.py) and passes each pushed version to the
+// 'snapshot-push' store. Interval polling is switched off while the stream is
+// connected and back on whenever it drops; EventSource reconnects by itself.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    change_feed: {
+        listen: function () {
+            const dashClientside = window.dash_clientside;
+            if (!window.EventSource || window.snapshotEvents) {
+                return dashClientside.no_update;
+            }
+            const source = new EventSource('/snapshot-events');
+            source.addEventListener('open', function () {
+                dashClientside.set_props('interval-component', {disabled: true});
+            });
+            source.addEventListener('error', function () {
+                dashClientside.set_props('interval-component', {disabled: false});
+            });
+            source.addEventListener('snapshot', function (event) {
+                dashClientside.set_props('snapshot-push', {data: Number(event.data)});
+            });
+            window.snapshotEvents = source;
+            return dashClientside.no_update;
+        }
+    }
+});
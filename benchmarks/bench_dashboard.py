@@ -0,0 +1,431 @@
+"""
+End-to-end benchmark and load test of the dashboard against a local Postgres.
+
+For each row count, synthetic tables are generated and loaded into the
+database (see benchmarks/load_postgres.py), then each phase is timed:
+
+  connect     opening a database connection
+  tables      per table: query and transfer ("fetch"), typed DataFrame
+              construction ("build"), row count and DataFrame memory
+  refresh     a full IncrementalSync refresh, all tables in parallel
+  metrics     per metric (each chart's compute): the pandas implementation
+              on the fetched tables and the SQL query, plus both totals
+  charts      per chart: building the figure and serialising it to JSON
+  load_test   concurrent simulated browsers against the Flask server: full
+              page loads (layout plus every callback) and version polls,
+              reported as p50/p99 latency
+
+Timings are medians of --repeat runs. Peak RSS is the process maximum so far,
+so for clean memory numbers load the data separately and benchmark one size
+per run with --skip-load.
+
+Results are written as JSON and can be compared between commits:
+    python -m benchmarks.bench_dashboard --dsn "dbname=beatbnk_bench host=localhost user=postgres" 100000 --output before.json
+    (check out the other commit)
+    python -m benchmarks.bench_dashboard --dsn "..." 100000 --output after.json
+    python -m benchmarks.bench_dashboard --compare before.json after.json
+
+The tables are dropped and recreated in the target database: use a scratch one.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import psycopg2
+import requests
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+import database
+from benchmarks.load_postgres import load_tables
+from benchmarks.synthetic import generate_tables
+from charts import CHARTS
+from database import IncrementalSync, fetch_table, tables_to_query
+from manifest import required_columns, required_tables
+from metrics import PANDAS_METRICS, SQL_METRICS, _run_sql_metric, compute_pandas_metrics, fetch_sql_metrics
+
+DEFAULT_DSN = "dbname=beatbnk_bench host=localhost user=postgres"
+DEFAULT_ROWS = [100_000]
+DEFAULT_REPEAT = 3
+DEFAULT_CLIENTS = 10
+DEFAULT_PAGE_LOADS = 5
+# Version polls each simulated browser makes after every page load.
+POLLS_PER_PAGE_LOAD = 4
+
+
+# --- Measurement Helpers ---
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def timed(fn, repeat=1):
+    """Calls fn repeat times. Returns (median seconds, result of the last call)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def percentiles(latencies):
+    """p50 and p99 of a list of seconds, in milliseconds."""
+    if not latencies:
+        return {"count": 0, "p50_ms": None, "p99_ms": None}
+    ordered = sorted(latencies)
+    at = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+    return {"count": len(ordered), "p50_ms": at(0.50), "p99_ms": at(0.99)}
+
+
+def git_revision():
+    """Short commit hash of the working tree, marked '-dirty' if it has local changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+# --- Phases ---
+
+def time_connect(db_params, repeat):
+    def connect():
+        psycopg2.connect(**db_params).close()
+    return timed(connect, repeat)[0]
+
+
+def time_tables(db_params, table_names, repeat):
+    """Times fetching each table on its own connection, split into query/transfer and DataFrame build."""
+    sync = IncrementalSync(db_params, table_names, columns=required_columns())
+    typed_batch = database._typed_batch
+    build_seconds = []
+
+    def timed_batch(*args):
+        start = time.perf_counter()
+        df = typed_batch(*args)
+        build_seconds.append(time.perf_counter() - start)
+        return df
+
+    results = {}
+    connection = psycopg2.connect(**db_params)
+    database._typed_batch = timed_batch
+    try:
+        with connection.cursor() as cursor:
+            for table_name in table_names:
+                columns = sync._projection(cursor, table_name)
+                runs = []
+                for _ in range(repeat):
+                    build_seconds.clear()
+                    start = time.perf_counter()
+                    df = fetch_table(cursor, table_name, columns=columns)
+                    total = time.perf_counter() - start
+                    runs.append((total - sum(build_seconds), sum(build_seconds)))
+                connection.commit()
+                results[table_name] = {
+                    "rows": len(df),
+                    "fetch_s": statistics.median(fetch for fetch, _ in runs),
+                    "build_s": statistics.median(build for _, build in runs),
+                    "memory_mb": df.memory_usage(deep=True).sum() / 2**20,
+                }
+    finally:
+        database._typed_batch = typed_batch
+        connection.close()
+    return results
+
+
+def time_refresh(db_params, table_names, repeat):
+    """Times a full refresh the way the app runs it. Returns (seconds, tables)."""
+    return timed(lambda: IncrementalSync(db_params, table_names, columns=required_columns()).refresh(), repeat)
+
+
+def time_metrics(db_params, tables, repeat):
+    """
+    Times each metric on both backends. A pandas metric timed on its own also
+    pays for the shared precompute it uses, so the per-metric times add up to
+    more than pandas_total_s.
+    """
+    results = {}
+    connection = psycopg2.connect(**db_params)
+    try:
+        with connection.cursor() as cursor:
+            for name in PANDAS_METRICS:
+                results[name] = {
+                    "pandas_s": timed(lambda: compute_pandas_metrics(tables, [name]), repeat)[0],
+                    "sql_s": timed(lambda: _run_sql_metric(cursor, name), repeat)[0] if name in SQL_METRICS else None,
+                }
+    finally:
+        connection.close()
+    pandas_total, metrics = timed(lambda: compute_pandas_metrics(tables), repeat)
+    sql_total = timed(lambda: fetch_sql_metrics(db_params), repeat)[0]
+    return {"per_metric": results, "pandas_total_s": pandas_total, "sql_total_s": sql_total}, metrics
+
+
+def time_charts(metrics, repeat):
+    """Times building each chart's figure from the metrics and serialising it to JSON."""
+    results = {}
+    for chart_id, (_, build) in CHARTS.items():
+        build_s, figure = timed(lambda: build(metrics), repeat)
+        serialise_s, figure_json = timed(figure.to_json, repeat)
+        results[chart_id] = {"build_s": build_s, "serialise_s": serialise_s, "bytes": len(figure_json)}
+    return results
+
+
+# --- Load Test ---
+
+def _outputs(dependency):
+    """Parses a callback's output spec, e.g. '..a.children...a-shown.data..', into ids and properties."""
+    spec = dependency["output"]
+    parts = spec[2:-2].split("...") if spec.startswith("..") else [spec]
+    return [dict(zip(("id", "property"), part.rsplit(".", 1))) for part in parts]
+
+
+class DashClient:
+    """
+    A simulated browser. Fires the same callback requests the Dash renderer
+    would, carrying the values of stores and other inputs between requests.
+    """
+
+    def __init__(self, base_url, dependencies):
+        self.base_url = base_url
+        self.dependencies = dependencies
+        self.session = requests.Session()
+        self.values = {}
+        self.bytes_received = 0
+
+    def _get(self, path):
+        response = self.session.get(self.base_url + path)
+        response.raise_for_status()
+        self.bytes_received += len(response.content)
+
+    def call(self, dependency):
+        """Runs one callback and returns its latency in seconds."""
+        spec = lambda item: {**item, "value": self.values.get((item["id"], item["property"]))}
+        outputs = _outputs(dependency)
+        payload = {
+            "output": dependency["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [spec(item) for item in dependency["inputs"]],
+            "state": [spec(item) for item in dependency["state"]],
+            "changedPropIds": [f"{item['id']}.{item['property']}" for item in dependency["inputs"]],
+        }
+        start = time.perf_counter()
+        response = self.session.post(self.base_url + "/_dash-update-component", json=payload)
+        latency = time.perf_counter() - start
+        self.bytes_received += len(response.content)
+        if response.status_code == 200:
+            for component_id, props in response.json()["response"].items():
+                for prop, value in props.items():
+                    self.values[(component_id, prop)] = value
+        elif response.status_code != 204:  # 204: every output was no_update
+            response.raise_for_status()
+        return latency
+
+    def page_load(self):
+        """Loads the page and runs every callback. Returns (page latency, callback latencies)."""
+        self.values = {("interval-component", "n_intervals"): 0}
+        start = time.perf_counter()
+        self._get("/")
+        self._get("/_dash-layout")
+        # The version check runs first; the component callbacks are triggered by its output.
+        callbacks = sorted(self.dependencies, key=lambda dep: dep["inputs"][0]["id"] != "interval-component")
+        latencies = [self.call(dependency) for dependency in callbacks]
+        return time.perf_counter() - start, latencies
+
+    def poll(self):
+        """One interval tick: checks for a new snapshot version."""
+        self.values[("interval-component", "n_intervals")] += 1
+        poll = next(dep for dep in self.dependencies if dep["inputs"][0]["id"] == "interval-component")
+        return self.call(poll)
+
+
+_local_server = {}
+
+
+def local_server(db_params, metrics):
+    """
+    Serves the app from a background thread with a snapshot holding metrics.
+    The first call imports the app against the benchmark database; later calls
+    publish the new metrics to the running app. Returns the base URL.
+    """
+    if _local_server:
+        _local_server["app"].snapshot_store.publish(metrics)
+        return _local_server["url"]
+    from werkzeug.serving import make_server
+
+    snapshot_dir = tempfile.mkdtemp(prefix="beatbnk-bench-")
+    os.environ["DASHBOARD_SNAPSHOT_DIR"] = snapshot_dir
+    # The app reads this dict at import; never let the benchmark touch the real database.
+    database.db_connection_params.clear()
+    database.db_connection_params.update(db_params)
+    from snapshot_store import SnapshotStore
+    SnapshotStore(snapshot_dir).publish(metrics)  # Warm start, so the scheduler has nothing to do
+
+    import app as dashboard
+    dashboard.refresh_scheduler.stop()
+    http_server = make_server("127.0.0.1", 0, dashboard.server, threaded=True)
+    threading.Thread(target=http_server.serve_forever, name="bench-server", daemon=True).start()
+    _local_server.update(app=dashboard, url=f"http://127.0.0.1:{http_server.server_port}")
+    return _local_server["url"]
+
+
+def load_test(base_url, clients, page_loads):
+    """Runs clients simulated browsers concurrently, each doing page_loads page loads plus polls."""
+    # Only the dashboard's own callbacks; clientside and pattern-matching ones
+    # (e.g. from dash_bootstrap_templates) never reach the server from a browser.
+    dependencies = [dep for dep in requests.get(base_url + "/_dash-dependencies").json()
+                    if dep.get("clientside_function") is None and "{" not in dep["output"]]
+
+    def run_client(_):
+        client = DashClient(base_url, dependencies)
+        pages, callbacks, polls = [], [], []
+        for _ in range(page_loads):
+            page, latencies = client.page_load()
+            pages.append(page)
+            callbacks.extend(latencies)
+            polls.extend(client.poll() for _ in range(POLLS_PER_PAGE_LOAD))
+        return pages, callbacks, polls, client.bytes_received
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        outcomes = list(executor.map(run_client, range(clients)))
+    elapsed = time.perf_counter() - start
+    pages = [latency for outcome in outcomes for latency in outcome[0]]
+    return {
+        "clients": clients,
+        "page_loads_per_client": page_loads,
+        "page": percentiles(pages),
+        "callback": percentiles([latency for outcome in outcomes for latency in outcome[1]]),
+        "poll": percentiles([latency for outcome in outcomes for latency in outcome[2]]),
+        "page_loads_per_s": len(pages) / elapsed,
+        "bytes_per_page_load": sum(outcome[3] for outcome in outcomes) / max(len(pages), 1),
+    }
+
+
+# --- Runner ---
+
+def run(db_params, rows, repeat, clients, page_loads, base_url=None):
+    """Benchmarks every phase on the data currently in the database. Returns the results dict."""
+    table_names = required_tables(tables_to_query)
+    result = {}
+    result["connect_s"] = time_connect(db_params, repeat)
+    result["tables"] = time_tables(db_params, table_names, repeat)
+    result["refresh_s"], tables = time_refresh(db_params, table_names, repeat)
+    result["rows"] = rows if rows is not None else len(tables.get("users", ()))
+    result["peak_rss_after_fetch_mb"] = peak_rss_mb()
+    result["metrics"], metrics = time_metrics(db_params, tables, repeat)
+    result["charts"] = time_charts(metrics, repeat)
+    del tables
+    if base_url is None:
+        base_url = local_server(db_params, metrics)
+    result["load_test"] = load_test(base_url, clients, page_loads)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        return {key: leaf for name, item in value.items() for key, leaf in _flatten(item, f"{prefix}{name}.").items()}
+    return {prefix[:-1]: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(old_path, new_path):
+    """Prints every numeric result of two runs side by side, with the new/old ratio."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"old: {old['revision']}  new: {new['revision']}")
+    for old_run, new_run in zip(old["runs"], new["runs"]):
+        old_values, new_values = _flatten(old_run), _flatten(new_run)
+        print(f"\n{'rows=' + format(old_run['rows'], ','):<60} {'old':>12} {'new':>12} {'new/old':>8}")
+        for key in [key for key in old_values if key in new_values]:
+            a, b = old_values[key], new_values[key]
+            ratio = f"{b / a:>7.2f}x" if a else ""
+            print(f"{key:<60} {a:>12.4g} {b:>12.4g} {ratio:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("rows", nargs="*", type=int, help=f"row counts to generate and load (default {DEFAULT_ROWS})")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="scratch database to load and query")
+    parser.add_argument("--skip-load", action="store_true", help="benchmark the data already in the database")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument("--page-loads", type=int, default=DEFAULT_PAGE_LOADS, help="page loads per client")
+    parser.add_argument("--url", help="load-test an already running server (e.g. gunicorn) instead of one in-process")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    db_params = {"dsn": args.dsn}
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "clients": args.clients,
+        "runs": [],
+    }
+    for rows in ([None] if args.skip_load else args.rows or DEFAULT_ROWS):
+        if rows is not None:
+            synthetic_tables = generate_tables(rows)
+            load_seconds, _ = timed(lambda: load_tables(db_params, synthetic_tables))
+            del synthetic_tables
+            print(f"Loaded synthetic data for {rows:,} rows in {load_seconds:.1f}s.")
+        run_result = run(db_params, rows, args.repeat, args.clients, args.page_loads, args.url)
+        results["runs"].append(run_result)
+        summarise(run_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+def summarise(result):
+    print(f"\n=== rows={result['rows']:,}  connect {result['connect_s'] * 1000:.1f}ms  refresh {result['refresh_s']:.3f}s ===")
+    print(f"{'table':<28} {'rows':>12} {'fetch (s)':>10} {'build (s)':>10} {'MiB':>8}")
+    for table_name, t in result["tables"].items():
+        print(f"{table_name:<28} {t['rows']:>12,} {t['fetch_s']:>10.3f} {t['build_s']:>10.3f} {t['memory_mb']:>8.1f}")
+    print(f"\n{'metric':<28} {'pandas (s)':>10} {'sql (s)':>10}")
+    for name, m in result["metrics"]["per_metric"].items():
+        sql_s = f"{m['sql_s']:>10.3f}" if m["sql_s"] is not None else f"{'-':>10}"
+        print(f"{name:<28} {m['pandas_s']:>10.3f} {sql_s}")
+    print(f"{'(all metrics)':<28} {result['metrics']['pandas_total_s']:>10.3f} {result['metrics']['sql_total_s']:>10.3f}")
+    print(f"\n{'chart':<30} {'build (ms)':>10} {'json (ms)':>10} {'KiB':>8}")
+    for chart_id, c in result["charts"].items():
+        print(f"{chart_id:<30} {c['build_s'] * 1000:>10.1f} {c['serialise_s'] * 1000:>10.1f} {c['bytes'] / 1024:>8.1f}")
+    load = result["load_test"]
+    print(f"\nload test: {load['clients']} clients, {load['page_loads_per_s']:.1f} page loads/s, "
+          f"{load['bytes_per_page_load'] / 1024:.0f} KiB per page load")
+    for kind in ("page", "callback", "poll"):
+        print(f"  {kind:<9} p50 {load[kind]['p50_ms']:>8.1f}ms  p99 {load[kind]['p99_ms']:>8.1f}ms  (n={load[kind]['count']})")
+    if result["peak_rss_mb"] is not None:
+        print(f"peak RSS: {result['peak_rss_after_fetch_mb']:.0f} MiB after fetch, {result['peak_rss_mb']:.0f} MiB overall")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Times the dashboard's pandas work per snapshot, before and after the shared
+precompute stage, on synthetic data.
+
+"before" is the computation the original update_dashboard_visualizations did:
+nine DataFrame copies, pd.to_datetime per chart, the monthly users groupby
+twice, and a dict of every user's email to label ten performers.
+"after" is compute_pandas_metrics plus building every chart in charts.CHARTS.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pandas_metrics [rows ...]   # default: 10000 1000000 10000000
+"""
+import sys
+import time
+import warnings
+
+import pandas as pd
+import plotly.express as px
+
+from benchmarks.synthetic import generate_tables
+from charts import CHARTS
+from metrics import compute_pandas_metrics
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+
+
+def before(global_data):
+    """The original callback's data work and figure building, minus the empty-data branches."""
+    events_df = global_data.get('events', pd.DataFrame()).copy()
+    users_df = global_data.get('users', pd.DataFrame()).copy()
+    performers_df = global_data.get('performers', pd.DataFrame()).copy()
+    performer_tips_df = global_data.get('performer_tips', pd.DataFrame()).copy()
+    event_tickets_df = global_data.get('event_tickets', pd.DataFrame()).copy()
+    categories_df = global_data.get('categories', pd.DataFrame()).copy()
+    category_mappings_df = global_data.get('category_mappings', pd.DataFrame()).copy()
+    mpesa_payments_df = global_data.get('mpesa_stk_push_payments', pd.DataFrame()).copy()
+    venue_bookings_df = global_data.get('venue_bookings', pd.DataFrame()).copy()
+    figures = []
+
+    status_counts = events_df['eventStatus'].value_counts().reset_index()
+    status_counts.columns = ['Status', 'Count']
+    figures.append(px.pie(status_counts, values='Count', names='Status', hole=0.3))
+
+    users_df['registration_date'] = pd.to_datetime(users_df['createdAt']).dt.to_period('M')
+    monthly_users = users_df.groupby('registration_date').size().reset_index(name='count')
+    monthly_users['registration_date'] = monthly_users['registration_date'].astype(str)
+    figures.append(px.line(monthly_users, x='registration_date', y='count'))
+
+    events_with_tickets_df = pd.merge(events_df[['id', 'eventName']],
+                                      event_tickets_df[['eventId', 'totalTickets', 'availableTickets']],
+                                      left_on='id', right_on='eventId', how='left')
+    events_with_tickets_df['tickets_sold'] = events_with_tickets_df['totalTickets'] - events_with_tickets_df['availableTickets']
+    sales_by_event = events_with_tickets_df.groupby('eventName')['tickets_sold'].sum().reset_index()
+    sales_by_event = sales_by_event.sort_values(by='tickets_sold', ascending=False).head(10)
+    figures.append(px.bar(sales_by_event, x='eventName', y='tickets_sold'))
+
+    figures.append(px.histogram(event_tickets_df, x='price', nbins=20))
+
+    performer_tips_df['tip_date'] = pd.to_datetime(performer_tips_df['createdAt']).dt.date
+    daily_tips = performer_tips_df.groupby('tip_date')['tipAmount'].sum().reset_index()
+    figures.append(px.line(daily_tips, x='tip_date', y='tipAmount'))
+
+    performer_tips_merged = pd.merge(performer_tips_df, performers_df[['id', 'userId']], left_on='performerId', right_on='id', how='left')
+    user_emails = users_df.set_index('id')['email'].to_dict()
+    performer_tips_merged['performer_email'] = performer_tips_merged['userId'].map(user_emails).fillna('Unknown User')
+    tips_by_performer = performer_tips_merged.groupby('performer_email')['tipAmount'].sum().reset_index()
+    tips_by_performer = tips_by_performer.sort_values(by='tipAmount', ascending=False).head(10)
+    figures.append(px.bar(tips_by_performer, x='performer_email', y='tipAmount'))
+
+    mpesa_payments_df['transaction_date'] = pd.to_datetime(mpesa_payments_df['createdAt']).dt.date
+    daily_transactions = mpesa_payments_df.groupby('transaction_date')['transactionAmount'].sum().reset_index()
+    figures.append(px.line(daily_transactions, x='transaction_date', y='transactionAmount'))
+
+    events_categories = pd.merge(events_df[['id']], category_mappings_df[['eventId', 'categoryId']], left_on='id', right_on='eventId', how='inner')
+    events_categories = pd.merge(events_categories, categories_df[['id', 'name']], left_on='categoryId', right_on='id', how='inner', suffixes=('_event', '_category'))
+    category_counts = events_categories['name'].value_counts().reset_index()
+    category_counts.columns = ['Category', 'Count']
+    figures.append(px.bar(category_counts, x='Category', y='Count'))
+
+    users_df['registration_month'] = pd.to_datetime(users_df['createdAt']).dt.to_period('M')
+    monthly_users_count = users_df.groupby('registration_month').size().reset_index(name='count')
+    monthly_users_count['registration_month'] = monthly_users_count['registration_month'].astype(str)
+    figures.append(px.bar(monthly_users_count, x='registration_month', y='count'))
+
+    booking_counts = venue_bookings_df['bookingStatus'].value_counts().reset_index()
+    booking_counts.columns = ['Status', 'Count']
+    figures.append(px.pie(booking_counts, values='Count', names='Status', hole=0.3))
+    return figures
+
+
+def after(global_data):
+    metrics = compute_pandas_metrics(global_data)
+    return [build(metrics) for _, build in CHARTS.values()]
+
+
+def best_of(fn, tables, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(tables)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings("ignore", message="Converting to PeriodArray")
+    row_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_ROWS
+    print(f"{'rows':>12} {'before (s)':>12} {'after (s)':>12} {'speedup':>9}")
+    for rows in row_counts:
+        tables = generate_tables(rows)
+        repeat = 5 if rows <= 1_000_000 else 1
+        before_s = best_of(before, tables, repeat)
+        after_s = best_of(after, tables, repeat)
+        print(f"{rows:>12,} {before_s:>12.3f} {after_s:>12.3f} {before_s / after_s:>8.1f}x")
+        del tables
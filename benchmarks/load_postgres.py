@@ -0,0 +1,84 @@
+"""
+Loads the synthetic BeatBnk tables into a local Postgres database, so the
+real fetch and SQL metric paths can be benchmarked against them.
+
+Every table that is loaded is dropped and recreated first. Point this at a
+scratch database, never at a real one.
+
+Usage (from the repository root):
+    python -m benchmarks.load_postgres "dbname=beatbnk_bench host=localhost user=postgres" [rows]
+"""
+import io
+import sys
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+from benchmarks.synthetic import generate_tables
+
+# Rows written per COPY, to bound the size of the CSV buffer.
+COPY_CHUNK_ROWS = 1_000_000
+
+
+def _column_type(dtype):
+    """Postgres type for a synthetic DataFrame column."""
+    if str(dtype).startswith("datetime64") and getattr(dtype, "tz", None) is not None:
+        return "timestamptz"
+    if str(dtype).startswith("datetime64"):
+        return "timestamp"
+    if dtype.kind in "iu":
+        return "bigint"
+    if dtype.kind == "f":
+        return "double precision"
+    return "text"
+
+
+def _create_table(cursor, table_name, df):
+    columns = sql.SQL(", ").join(
+        sql.SQL("{} {}").format(sql.Identifier(column), sql.SQL(_column_type(df[column].dtype)))
+        for column in df.columns
+    )
+    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(sql.Identifier(table_name)))
+    cursor.execute(sql.SQL("CREATE TABLE {} ({})").format(sql.Identifier(table_name), columns))
+
+
+def _copy_rows(cursor, table_name, df):
+    copy = sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv)").format(sql.Identifier(table_name))
+    for start in range(0, len(df), COPY_CHUNK_ROWS):
+        buffer = io.StringIO()
+        df.iloc[start:start + COPY_CHUNK_ROWS].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy.as_string(cursor), buffer)
+
+
+def load_tables(db_params, tables):
+    """
+    (Re)creates each table in the database and bulk-loads its rows with COPY.
+    Tables with an id column get it as their primary key, like the real schema.
+    """
+    connection = psycopg2.connect(**db_params)
+    try:
+        with connection, connection.cursor() as cursor:
+            for table_name, df in tables.items():
+                _create_table(cursor, table_name, df)
+                _copy_rows(cursor, table_name, df)
+                if "id" in df.columns:
+                    cursor.execute(sql.SQL("ALTER TABLE {} ADD PRIMARY KEY (id)").format(sql.Identifier(table_name)))
+        # ANALYZE cannot run inside the transaction block above.
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            for table_name in tables:
+                cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table_name)))
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    params = {"dsn": sys.argv[1]}
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    start = time.perf_counter()
+    synthetic_tables = generate_tables(rows)
+    load_tables(params, synthetic_tables)
+    print(f"Loaded {sum(len(df) for df in synthetic_tables.values()):,} rows into "
+          f"{len(synthetic_tables)} tables in {time.perf_counter() - start:.1f}s.")
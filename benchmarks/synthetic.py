@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# --- Synthetic BeatBnk Dataset ---
+# Table sizes relative to `rows`, the size of the largest tables.
+TABLE_SCALE = {
+    "users": 1.0,
+    "performers": 0.05,
+    "events": 0.1,
+    "event_tickets": 0.1,
+    "category_mappings": 0.1,
+    "performer_tips": 1.0,
+    "mpesa_stk_push_payments": 1.0,
+    "venue_bookings": 0.1,
+    "venues": 0.001,
+}
+CATEGORY_NAMES = ["Music", "Comedy", "Art", "Food", "Sports", "Theatre", "Film", "Dance", "Tech", "Fashion"]
+EVENT_STATUSES = ["draft", "published", "cancelled", "completed"]
+BOOKING_STATUSES = ["pending", "confirmed", "cancelled"]
+HISTORY_DAYS = 3 * 365
+TIMEZONE = "Africa/Nairobi"
+
+
+def _timestamps(rng, n, start):
+    seconds = rng.integers(0, HISTORY_DAYS * 86400, n)
+    return pd.to_datetime(start.value + seconds * 10**9, utc=True).tz_convert(TIMEZONE)
+
+
+def _ids(n):
+    return np.arange(1, n + 1, dtype=np.int64)
+
+
+def generate_tables(rows, seed=0):
+    """
+    Generates the tables the dashboard reads, typed the way database.fetch_table
+    returns them (datetime64 in the session time zone, numeric, categorical statuses).
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2023-01-01", tz="UTC")
+    n = {name: max(int(rows * scale), 1) for name, scale in TABLE_SCALE.items()}
+    tables = {}
+
+    users_created = _timestamps(rng, n["users"], start)
+    tables["users"] = pd.DataFrame({
+        "id": _ids(n["users"]),
+        "email": "user" + pd.Series(_ids(n["users"])).astype(str) + "@example.com",
+        "createdAt": users_created,
+        "updatedAt": users_created,
+    })
+    tables["performers"] = pd.DataFrame({
+        "id": _ids(n["performers"]),
+        "userId": rng.integers(1, n["users"] + 1, n["performers"]),
+        "updatedAt": _timestamps(rng, n["performers"], start),
+    })
+    events_created = _timestamps(rng, n["events"], start)
+    tables["events"] = pd.DataFrame({
+        "id": _ids(n["events"]),
+        "eventName": "Event " + pd.Series(rng.integers(0, max(n["events"] // 2, 1), n["events"])).astype(str),
+        "eventStatus": pd.Categorical(rng.choice(EVENT_STATUSES, n["events"])),
+        "createdAt": events_created,
+        "updatedAt": events_created,
+    })
+    total = rng.integers(50, 500, n["event_tickets"])
+    tables["event_tickets"] = pd.DataFrame({
+        "id": _ids(n["event_tickets"]),
+        "eventId": rng.integers(1, n["events"] + 1, n["event_tickets"]),
+        "totalTickets": total,
+        "availableTickets": (total * rng.random(n["event_tickets"])).astype(np.int64),
+        "price": rng.integers(1, 100, n["event_tickets"]) * 100.0,
+        "updatedAt": _timestamps(rng, n["event_tickets"], start),
+    })
+    tables["categories"] = pd.DataFrame({
+        "id": _ids(len(CATEGORY_NAMES)),
+        "name": CATEGORY_NAMES,
+    })
+    tables["category_mappings"] = pd.DataFrame({
+        "id": _ids(n["category_mappings"]),
+        "eventId": rng.integers(1, n["events"] + 1, n["category_mappings"]),
+        "categoryId": rng.integers(1, len(CATEGORY_NAMES) + 1, n["category_mappings"]),
+    })
+    tables["performer_tips"] = pd.DataFrame({
+        "id": _ids(n["performer_tips"]),
+        "performerId": rng.integers(1, n["performers"] + 1, n["performer_tips"]),
+        "tipAmount": rng.integers(10, 5000, n["performer_tips"]).astype(float),
+        "createdAt": _timestamps(rng, n["performer_tips"], start),
+    })
+    tables["mpesa_stk_push_payments"] = pd.DataFrame({
+        "id": _ids(n["mpesa_stk_push_payments"]),
+        "transactionAmount": rng.integers(10, 20000, n["mpesa_stk_push_payments"]).astype(float),
+        "createdAt": _timestamps(rng, n["mpesa_stk_push_payments"], start),
+    })
+    tables["venues"] = pd.DataFrame({
+        "id": _ids(n["venues"]),
+        "name": "Venue " + pd.Series(_ids(n["venues"])).astype(str),
+    })
+    tables["venue_bookings"] = pd.DataFrame({
+        "id": _ids(n["venue_bookings"]),
+        "venueId": rng.integers(1, n["venues"] + 1, n["venue_bookings"]),
+        "bookingStatus": pd.Categorical(rng.choice(BOOKING_STATUSES, n["venue_bookings"])),
+        "createdAt": _timestamps(rng, n["venue_bookings"], start),
+    })
+    return tables
@@ -0,0 +1,166 @@
+"""
+Detects which tables changed, so a refresh can recompute only the metrics
+that read them instead of everything on a timer.
+
+Optionally install NOTIFY triggers so changes are reported the moment they
+commit (the probe alone sees most changes within a few seconds):
+    python change_feed.py "dbname=beatbnk_db host=... user=..."
+"""
+import os
+import select
+import sys
+
+import psycopg2
+import psycopg2.sql as sql
+
+from database import PRIMARY_KEY_COLUMN, STATEMENT_TIMEOUT_MS, fetch_table_columns, tables_to_query
+from manifest import required_tables
+
+# --- Change Feed Settings ---
+# "interval" refreshes every metric on a timer; "change-feed" refreshes only
+# the metrics whose tables changed, as soon as the change is seen, and pushes
+# new versions to browsers over /snapshot-events. Each open browser tab holds
+# a server thread for its event stream, so run change-feed mode with threaded
+# or async workers, e.g.
+#     gunicorn app:server --worker-class gthread --workers 2 --threads 32
+# Sync workers answer the stream with 204 and browsers fall back to polling.
+REFRESH_MODE = os.environ.get("DASHBOARD_REFRESH_MODE", "interval")
+# Seconds between probes while no notification arrives.
+PROBE_INTERVAL_SECONDS = 2
+# Channel the NOTIFY triggers publish on; the payload is the table name.
+CHANGE_CHANNEL = "dashboard_changes"
+TRIGGER_NAME = "dashboard_notify_change"
+
+TRIGGER_FUNCTION_SQL = f'''
+    CREATE OR REPLACE FUNCTION {TRIGGER_NAME}() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{CHANGE_CHANNEL}', TG_TABLE_NAME);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+'''
+
+
+def _probe_query(cursor, table_names):
+    """
+    One query returning, per table, its cumulative insert/update/delete count
+    from the statistics collector and its highest primary key. Both are read
+    from catalogs or an index, so the probe costs the same at any table size.
+    The counters see every change but can lag by a few seconds; the key sees
+    new rows (tips, payments) as soon as they commit.
+    """
+    selects = []
+    for table_name in table_names:
+        has_key = PRIMARY_KEY_COLUMN in fetch_table_columns(cursor, table_name)
+        selects.append(sql.SQL(
+            "SELECT {name}, (SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables "
+            "WHERE relid = {regclass}::regclass), {max_key}"
+        ).format(
+            name=sql.Literal(table_name),
+            regclass=sql.Literal(sql.Identifier(table_name).as_string(cursor)),
+            max_key=(sql.SQL("(SELECT max({})::text FROM {})").format(
+                sql.Identifier(PRIMARY_KEY_COLUMN), sql.Identifier(table_name)) if has_key else sql.SQL("NULL")),
+        ))
+    return sql.SQL(" UNION ALL ").join(selects)
+
+
+class ChangeFeed:
+    """
+    Reports which of table_names changed, over one persistent connection.
+
+    The connection LISTENs on CHANGE_CHANNEL, so tables with the NOTIFY
+    triggers installed are reported as soon as a change commits. Every call
+    also probes all tables, which catches changes to tables without triggers.
+    While nothing changes, a call is one select() on the socket plus one small
+    query.
+    """
+
+    def __init__(self, db_params, table_names, probe_interval=PROBE_INTERVAL_SECONDS, channel=CHANGE_CHANNEL):
+        self.db_params = db_params
+        self.table_names = list(table_names)
+        self.probe_interval = probe_interval
+        self.channel = channel
+        self.connection = None
+        self.query = None
+        self.state = {}  # table name -> (change counter, highest key) at the last probe
+
+    def _connect(self):
+        connection = psycopg2.connect(options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS}", **self.db_params)
+        try:
+            connection.autocommit = True  # Each probe sees fresh statistics, and notifications arrive between them
+            with connection.cursor() as cursor:
+                cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                # Tables that do not exist (yet) are left out until the next reconnect.
+                existing = [table_name for table_name in self.table_names if fetch_table_columns(cursor, table_name)]
+                self.query = _probe_query(cursor, existing) if existing else None
+        except Exception:
+            connection.close()
+            raise
+        self.connection = connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
+
+    def _probe(self):
+        """Returns the tables whose counters or highest key moved since the last probe."""
+        if self.query is None:
+            return set()
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.query)
+            state = {table_name: (counter, max_key) for table_name, counter, max_key in cursor.fetchall()}
+        changed = {table_name for table_name, values in state.items() if self.state.get(table_name) != values}
+        self.state = state
+        return changed
+
+    def changes(self):
+        """
+        Waits up to probe_interval seconds for a notification, then probes.
+        Returns the set of tables changed since the last call (often empty), or
+        None right after (re)connecting, when changes may have been missed and
+        everything should be refreshed. Raises on database errors, after
+        dropping the connection so the next call reconnects.
+        """
+        try:
+            if self.connection is None:
+                self._connect()
+                self._probe()
+                return None
+            changed = set()
+            ready, _, _ = select.select([self.connection], [], [], self.probe_interval)
+            if ready:
+                self.connection.poll()
+                changed.update(notify.payload for notify in self.connection.notifies)
+                self.connection.notifies.clear()
+            changed |= self._probe()
+            return changed & set(self.table_names)
+        except (Exception, psycopg2.Error):
+            self.close()
+            raise
+
+
+def install_triggers(db_params, table_names):
+    """
+    Creates (or replaces) statement-level triggers that NOTIFY CHANGE_CHANNEL
+    with the table name after every insert, update, delete or truncate.
+    """
+    connection = psycopg2.connect(**db_params)
+    try:
+        with connection, connection.cursor() as cursor:
+            cursor.execute(TRIGGER_FUNCTION_SQL)
+            for table_name in table_names:
+                trigger, table = sql.Identifier(TRIGGER_NAME), sql.Identifier(table_name)
+                cursor.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(trigger, table))
+                cursor.execute(sql.SQL(
+                    "CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {} "
+                    "FOR EACH STATEMENT EXECUTE FUNCTION {}()"
+                ).format(trigger, table, trigger))
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    tables = required_tables(tables_to_query)
+    install_triggers({"dsn": sys.argv[1]}, tables)
+    print(f"Installed NOTIFY triggers on {len(tables)} tables: {', '.join(tables)}.")
@@ -0,0 +1,171 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from downsampling import WEBGL_MIN_POINTS, downsample
+from metrics import UNKNOWN_USER
+
+
+# --- Figure Helpers ---
+def empty_figure(title, message):
+    """Returns a blank figure with a centred message, used when a chart has no data."""
+    fig = go.Figure()
+    fig.add_annotation(text=message, xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
+    fig.update_layout(title=title, xaxis_visible=False, yaxis_visible=False)
+    return fig
+
+
+def loading_figure():
+    """Placeholder shown until the first snapshot has been loaded."""
+    fig = go.Figure()
+    fig.add_annotation(text="Loading data...", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
+    fig.update_layout(xaxis_visible=False, yaxis_visible=False)
+    return fig
+
+
+def _metric_value(metrics, name):
+    """Returns the single value of a KPI metric, or 0 if it is missing."""
+    df = metrics.get(name)
+    return df['value'].iloc[0] if df is not None and not df.empty else 0
+
+
+def _time_series_line(daily, value, window, title, labels):
+    """
+    Line chart of a daily series, summed into buckets server-side so at most
+    MAX_POINTS points are sent, at the finest resolution the window allows.
+    """
+    series, bucket = downsample(daily, 'date', value, window)
+    fig = px.line(series, x='date', y=value, title=f'{title} ({bucket})', labels=labels,
+                  render_mode='webgl' if len(series) > WEBGL_MIN_POINTS else 'svg')
+    if window is not None:
+        fig.update_xaxes(range=list(window))
+    return fig
+
+
+# --- 10 Visualizations ---
+
+# 1. Event Status Distribution (Pie Chart)
+def event_status_pie(metrics):
+    status_counts = metrics.get('event_status_counts', pd.DataFrame())
+    if status_counts.empty:
+        return empty_figure('Distribution of Event Status', "No event status data available.")
+    return px.pie(status_counts, values='Count', names='Status',
+                  title='Distribution of Event Status', hole=0.3)
+
+
+# 2. New Users Registered Over Time (Line Chart, bucketed by the zoomed range)
+def new_users_line(metrics, window=None):
+    daily_users = metrics.get('daily_new_users', pd.DataFrame())
+    if daily_users.empty:
+        return empty_figure('New Users Registered Over Time', "No user registration data available.")
+    return _time_series_line(daily_users, 'count', window, 'New Users Registered Over Time',
+                             labels={'date': 'Date', 'count': 'New Users'})
+
+
+# 3. Top 10 Events by Tickets Sold (Bar Chart)
+def event_ticket_sales(metrics):
+    sales_by_event = metrics.get('top_events_by_tickets_sold', pd.DataFrame())
+    if sales_by_event.empty:
+        return empty_figure('Top 10 Events by Tickets Sold', "Required data for ticket sales not available.")
+    return px.bar(sales_by_event, x='eventName', y='tickets_sold',
+                  title='Top 10 Events by Tickets Sold',
+                  labels={'eventName': 'Event Name', 'tickets_sold': 'Tickets Sold'})
+
+
+# 4. Distribution of Event Ticket Prices (Histogram, binned by the metrics layer)
+def event_price_distribution(metrics):
+    price_bins = metrics.get('ticket_price_histogram', pd.DataFrame())
+    if price_bins.empty:
+        return empty_figure('Distribution of Event Ticket Prices', "No ticket price data available.")
+    fig = go.Figure(go.Bar(x=(price_bins['bin_start'] + price_bins['bin_end']) / 2,
+                           y=price_bins['count'],
+                           width=price_bins['bin_end'] - price_bins['bin_start']))
+    fig.update_layout(title='Distribution of Event Ticket Prices', bargap=0,
+                      xaxis_title='Ticket Price (KSH)', yaxis_title='Number of Tickets')
+    return fig
+
+
+# 5. Total Tips Amount Over Time (Line Chart, bucketed by the zoomed range)
+def total_tips_over_time(metrics, window=None):
+    daily_tips = metrics.get('daily_tips', pd.DataFrame())
+    if daily_tips.empty:
+        return empty_figure('Total Tips Amount Over Time', "No tips data available.")
+    return _time_series_line(daily_tips, 'amount', window, 'Total Tips Amount Over Time',
+                             labels={'date': 'Date', 'amount': 'Total Tip Amount (KSH)'})
+
+
+# 6. Top 10 Tipped Performers (Bar Chart)
+def top_tipped_performers(metrics):
+    tips_by_performer = metrics.get('top_tipped_performers', pd.DataFrame())
+    if tips_by_performer.empty or tips_by_performer['performer_email'].eq(UNKNOWN_USER).all():
+        return empty_figure('Top 10 Tipped Performers (by Email)', "No performer tips or performer data available.")
+    return px.bar(tips_by_performer, x='performer_email', y='tipAmount',
+                  title='Top 10 Tipped Performers (by Email)',
+                  labels={'performer_email': 'Performer Email', 'tipAmount': 'Total Tip Amount (KSH)'})
+
+
+# 7. Total Transaction Amount Over Time (Line Chart, bucketed by the zoomed range)
+def total_transactions_over_time(metrics, window=None):
+    daily_transactions = metrics.get('daily_transactions', pd.DataFrame())
+    if daily_transactions.empty:
+        return empty_figure('Total Transaction Amount Over Time (Mpesa STK Push)',
+                            "No Mpesa STK Push payments data available.")
+    return _time_series_line(daily_transactions, 'amount', window, 'Total Transaction Amount Over Time (Mpesa STK Push)',
+                             labels={'date': 'Date', 'amount': 'Total Amount (KSH)'})
+
+
+# 8. Events by Category (Bar Chart)
+def events_by_category(metrics):
+    category_counts = metrics.get('events_by_category', pd.DataFrame())
+    if category_counts.empty:
+        return empty_figure('Number of Events by Category', "Required data for events by category not available.")
+    return px.bar(category_counts, x='Category', y='Count',
+                  title='Number of Events by Category',
+                  labels={'Count': 'Number of Events'})
+
+
+# 9. Users by Registration Month/Year (Bar Chart, same monthly counts as chart 2)
+def users_by_registration_month(metrics):
+    monthly_users = metrics.get('monthly_new_users', pd.DataFrame())
+    if monthly_users.empty:
+        return empty_figure('Users Registered by Month', "No user registration data available.")
+    fig = px.bar(monthly_users, x='month', y='count',
+                 title='Users Registered by Month',
+                 labels={'month': 'Registration Month', 'count': 'Number of Users'})
+    fig.update_xaxes(type='category')
+    return fig
+
+
+# 10. Venue Booking Status Distribution (Pie Chart)
+def venue_booking_status_pie(metrics):
+    booking_status_counts = metrics.get('venue_booking_status_counts', pd.DataFrame())
+    if booking_status_counts.empty:
+        return empty_figure('Distribution of Venue Booking Status', "No venue booking status data available.")
+    return px.pie(booking_status_counts, values='Count', names='Status',
+                  title='Distribution of Venue Booking Status', hole=0.3)
+
+
+# --- Chart Registry ---
+# Component id -> (metrics it is drawn from, function building its content from the metrics).
+KPIS = {
+    'kpi-total-events': (['total_events'], lambda metrics: f"{_metric_value(metrics, 'total_events')}"),
+    'kpi-total-users': (['total_users'], lambda metrics: f"{_metric_value(metrics, 'total_users')}"),
+    'kpi-total-performers': (['total_performers'], lambda metrics: f"{_metric_value(metrics, 'total_performers')}"),
+    'kpi-total-tips': (['total_tips'], lambda metrics: f"Ksh {_metric_value(metrics, 'total_tips'):,.2f}"),
+}
+
+CHARTS = {
+    'event-status-pie': (['event_status_counts'], event_status_pie),
+    'new-users-line': (['daily_new_users'], new_users_line),
+    'event-ticket-sales': (['top_events_by_tickets_sold'], event_ticket_sales),
+    'event-price-distribution': (['ticket_price_histogram'], event_price_distribution),
+    'total-tips-over-time': (['daily_tips'], total_tips_over_time),
+    'top-tipped-performers': (['top_tipped_performers'], top_tipped_performers),
+    'total-transactions-over-time': (['daily_transactions'], total_transactions_over_time),
+    'events-by-category': (['events_by_category'], events_by_category),
+    'users-by-registration-month': (['monthly_new_users'], users_by_registration_month),
+    'venue-booking-status-pie': (['venue_booking_status_counts'], venue_booking_status_pie),
+}
+
+# Time series charts whose build function takes the zoomed x range (see downsampling.py).
+ZOOMABLE_CHARTS = {'new-users-line', 'total-tips-over-time', 'total-transactions-over-time'}
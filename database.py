@@ -0,0 +1,358 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import psycopg2.pool
+import psycopg2.sql as sql
+from pandas.api.types import union_categoricals
+
+from instrumentation import REGISTRY, frame_bytes
+
+# --- Database Connection Parameters ---
+db_connection_params = {
+    "dbname": "beatbnk_db",
+    "user": "user",
+    "password": "X1SOrzeSrk",
+    "host": "beatbnk-db-green-0j3yjq.cdgq4essi2q1.ap-southeast-2.rds.amazonaws.com",
+    "port": "5432"
+}
+
+tables_to_query = [
+    "SequelizeMeta", "attendees", "categories", "category_mappings",
+    "event_tickets", "events", "follows", "genres", "group_permissions",
+    "groups", "interests", "media_files", "media_types",
+    "mpesa_stk_push_payments", "otps", "performer_genres",
+    "performer_tip_payments", "performer_tips", "performers",
+    "permissions", "refresh_tokens", "song_request_payments",
+    "song_requests", "tickets", "user_fcm_tokens", "user_groups",
+    "user_interests", "user_venue_bookings", "users", "venue_bookings",
+    "venues"
+]
+
+# --- Connection Pool Settings ---
+# Tables (or metric queries) fetched at once; each uses its own pooled connection.
+FETCH_WORKERS = 8
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = FETCH_WORKERS
+# Server-side limit for any single query, so one slow table cannot stall a refresh.
+STATEMENT_TIMEOUT_MS = 30 * 1000
+
+# --- Ingestion Settings ---
+# Rows pulled per round trip from a server-side cursor; bounds peak memory while reading.
+FETCH_BATCH_SIZE = 50000
+# PostgreSQL type OIDs converted to proper dtypes as rows are read.
+DATE_TYPE_OIDS = {1082, 1114}  # date, timestamp
+TIMESTAMPTZ_TYPE_OIDS = {1184}  # timestamptz, kept in the session time zone
+NUMERIC_TYPE_OIDS = {20, 21, 23, 700, 701, 1700}  # int8, int2, int4, float4, float8, numeric
+# Low-cardinality text columns stored as pandas categoricals.
+CATEGORICAL_COLUMNS = {"eventStatus", "bookingStatus", "status"}
+
+# --- Incremental Sync Settings ---
+# Columns tried, in order, as a table's high-water mark. Tables with none of
+# them are synced on their primary key (inserts only) or re-fetched in full.
+WATERMARK_COLUMNS = ["updatedAt", "createdAt"]
+PRIMARY_KEY_COLUMN = "id"
+# Seconds between full reconciles, which are the only way deletes are seen.
+FULL_RECONCILE_INTERVAL = 15 * 60
+
+
+class SyncFailed(Exception):
+    """Raised when a sync could not fetch any table, e.g. because the database was unreachable."""
+
+
+def fetch_table_columns(cursor, table_name):
+    """Returns the column names of a table in the current schema, in table order."""
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s "
+        "ORDER BY ordinal_position",
+        (table_name,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _typed_batch(records, columns, type_codes, timezone):
+    """
+    Converts fetched rows into one Series per column, converting dates and
+    numbers from object dtype and CATEGORICAL_COLUMNS to categoricals.
+    Each Series owns its data, so it can be freed independently of the others.
+    """
+    values = zip(*records) if records else [()] * len(columns)
+    batch = {}
+    for column, type_code, column_values in zip(columns, type_codes, values):
+        series = pd.Series(column_values, dtype=object)
+        if type_code in TIMESTAMPTZ_TYPE_OIDS:
+            series = pd.to_datetime(series, utc=True)
+            try:
+                series = series.dt.tz_convert(timezone)
+            except Exception:
+                pass  # Unrecognised session time zone name; keep UTC
+        elif type_code in DATE_TYPE_OIDS:
+            series = pd.to_datetime(series)
+        elif type_code in NUMERIC_TYPE_OIDS:
+            series = pd.to_numeric(series)
+        elif column in CATEGORICAL_COLUMNS:
+            series = series.astype("category")
+        batch[column] = series
+    return batch
+
+
+def _concat_column(chunks):
+    """Joins the per-batch Series of one column, keeping categoricals categorical."""
+    if len(chunks) == 1:
+        return chunks[0]
+    if isinstance(chunks[0].dtype, pd.CategoricalDtype):
+        return pd.Series(union_categoricals(chunks))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def fetch_table(cursor, table_name, columns=None, since=None):
+    """
+    Fetches rows of a table into a DataFrame with typed columns.
+    Rows are streamed from a server-side cursor in batches of FETCH_BATCH_SIZE.
+    Each batch is typed and appended to per-column buffers as soon as it
+    arrives, and the buffers are joined one column at a time, so peak memory
+    is about the final table plus one batch or column.
+    If columns is given, only those columns are selected.
+    If since=(column, value) is given, only rows with column >= value are returned.
+    """
+    if columns:
+        projection = sql.SQL(", ").join(sql.Identifier(column) for column in columns)
+    else:
+        projection = sql.SQL("*")
+    query = sql.SQL("SELECT {} FROM {}").format(projection, sql.Identifier(table_name))
+    params = None
+    if since is not None:
+        column, value = since
+        query = sql.SQL("{} WHERE {} >= %s").format(query, sql.Identifier(column))
+        params = (value,)
+
+    start = time.perf_counter()
+    connection = cursor.connection
+    timezone = connection.info.parameter_status("TimeZone")
+    with connection.cursor(name="dashboard_fetch") as stream:
+        stream.itersize = FETCH_BATCH_SIZE
+        stream.execute(query, params)
+        records = stream.fetchmany(FETCH_BATCH_SIZE)
+        columns = [desc[0] for desc in stream.description]
+        type_codes = [desc[1] for desc in stream.description]
+        buffers = {column: [] for column in columns}
+        while records:
+            for column, series in _typed_batch(records, columns, type_codes, timezone).items():
+                buffers[column].append(series)
+            records = stream.fetchmany(FETCH_BATCH_SIZE)
+    if not any(buffers.values()):
+        buffers = {column: [series] for column, series in _typed_batch([], columns, type_codes, timezone).items()}
+    # copy=False keeps each joined column as its own block instead of copying them into one.
+    df = pd.DataFrame({column: _concat_column(buffers.pop(column)) for column in columns}, copy=False)
+    REGISTRY.observe("dashboard_table_fetch_seconds", time.perf_counter() - start, table=table_name)
+    REGISTRY.inc("dashboard_table_fetch_rows_total", len(df), table=table_name)
+    return df
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class _BoundedPool:
+    """A ThreadedConnectionPool whose getconn waits for a free connection instead of raising."""
+
+    def __init__(self, db_params):
+        self.pool = psycopg2.pool.ThreadedConnectionPool(
+            POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS,
+            options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS}", **db_params
+        )
+        self.slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+
+    @contextmanager
+    def connection(self):
+        with self.slots:
+            connection = self.pool.getconn()
+            try:
+                yield connection
+            finally:
+                # Connections the server dropped are discarded rather than reused.
+                self.pool.putconn(connection, close=bool(connection.closed))
+
+
+def get_pool(db_params):
+    """Returns the process-wide connection pool for db_params, creating it on first use."""
+    key = tuple(sorted(db_params.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = _BoundedPool(db_params)
+        return _pools[key]
+
+
+def fetch_parallel(db_params, jobs, max_workers=FETCH_WORKERS):
+    """
+    Runs jobs concurrently, each on its own pooled connection.
+    jobs maps a name to a function taking a cursor. A failing job does not
+    affect the others. Returns (results, errors), both dictionaries keyed by name.
+    """
+    results, errors = {}, {}
+    try:
+        pool = get_pool(db_params)
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(f"A critical database error occurred: {error}")
+        return results, {name: error for name in jobs}
+
+    def run(job):
+        with pool.connection() as connection:
+            with connection.cursor() as cursor:
+                return job(cursor)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(run, job) for name, job in jobs.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except (Exception, psycopg2.Error) as error:
+                errors[name] = error
+    return results, errors
+
+
+def merge_rows(cached_df, delta_df, key=PRIMARY_KEY_COLUMN):
+    """
+    Merges newly fetched rows into a cached DataFrame.
+    Rows in delta_df replace cached rows with the same key.
+    """
+    if delta_df.empty:
+        return cached_df
+    if cached_df.empty or key not in cached_df.columns:
+        return delta_df.reset_index(drop=True)
+    kept = cached_df[~cached_df[key].isin(delta_df[key])]
+    merged = pd.concat([kept, delta_df], ignore_index=True)
+    # Concatenating categoricals with different categories falls back to object dtype.
+    for column in CATEGORICAL_COLUMNS.intersection(merged.columns):
+        if merged[column].dtype != "category":
+            merged[column] = merged[column].astype("category")
+    return merged
+
+
+def _watermark_column(columns):
+    """Returns the column used as a table's high-water mark, or None."""
+    for column in WATERMARK_COLUMNS:
+        if column in columns:
+            return column
+    if PRIMARY_KEY_COLUMN in columns:
+        return PRIMARY_KEY_COLUMN
+    return None
+
+
+def _to_db_param(value):
+    """Converts a pandas/numpy scalar into a value psycopg2 can adapt."""
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class IncrementalSync:
+    """
+    Keeps a dictionary of DataFrames in step with the database.
+
+    The first refresh fetches every table in full. Later refreshes fetch only
+    rows at or past each table's high-water mark and merge them into the cache
+    by primary key, so their cost grows with the rate of change rather than with
+    table size. Every FULL_RECONCILE_INTERVAL seconds each table is re-fetched
+    in full to pick up deleted rows; a table whose reconcile fails is retried
+    in full on the next refresh, without holding back the others.
+
+    If columns maps a table name to the columns the dashboard reads, only those
+    (plus the primary key and watermark columns) are selected for that table.
+    """
+
+    def __init__(self, db_params, table_names, columns=None, full_reconcile_interval=FULL_RECONCILE_INTERVAL):
+        self.db_params = db_params
+        self.table_names = list(table_names)
+        self.columns = columns or {}
+        self.full_reconcile_interval = full_reconcile_interval
+        self.data = {}
+        self.watermarks = {}  # table name -> (column, value)
+        self.projections = {}  # table name -> list of columns to select
+        self.reconciled = {}  # table name -> monotonic time of its last full fetch
+        self.errors = {}  # table name -> error, for tables whose last sync failed
+
+    def _projection(self, cursor, table_name):
+        """Resolves the columns to select for a table against its actual schema."""
+        if table_name not in self.columns:
+            return None
+        if table_name not in self.projections:
+            available = fetch_table_columns(cursor, table_name)
+            wanted = set(self.columns[table_name]) | {PRIMARY_KEY_COLUMN, _watermark_column(available)}
+            # Fall back to SELECT * if the schema lookup finds nothing.
+            self.projections[table_name] = [c for c in available if c in wanted] or None
+        return self.projections[table_name]
+
+    def _reconcile_due(self, table_name):
+        reconciled = self.reconciled.get(table_name)
+        return reconciled is None or time.monotonic() - reconciled >= self.full_reconcile_interval
+
+    def _sync_table(self, cursor, table_name, full):
+        columns = self._projection(cursor, table_name)
+        watermark = self.watermarks.get(table_name)
+        cached_df = self.data.get(table_name)
+        # Tables without a usable key or watermark can only be re-fetched in full.
+        can_merge = (watermark is not None and cached_df is not None and
+                     PRIMARY_KEY_COLUMN in cached_df.columns)
+        if full or not can_merge:
+            df = fetch_table(cursor, table_name, columns=columns)
+            fetched_bytes = table_bytes = frame_bytes(df)
+        else:
+            delta_df = fetch_table(cursor, table_name, columns=columns, since=watermark)
+            df = merge_rows(cached_df, delta_df)
+            fetched_bytes = frame_bytes(delta_df)
+            # Measuring the merged table costs about as much as the merge, so skip it when nothing changed.
+            table_bytes = frame_bytes(df) if not delta_df.empty else None
+        REGISTRY.inc("dashboard_table_fetch_bytes_total", fetched_bytes, table=table_name)
+        if table_bytes is not None:
+            REGISTRY.set("dashboard_table_memory_bytes", table_bytes, table=table_name)
+
+        column = _watermark_column(df.columns)
+        if column is not None and not df.empty and df[column].notna().any():
+            self.watermarks[table_name] = (column, _to_db_param(df[column].max()))
+        else:
+            self.watermarks.pop(table_name, None)
+        return df
+
+    def refresh(self, table_names=None):
+        """
+        Brings the cached DataFrames up to date, several tables at once, and returns them.
+        If table_names is given, only those tables (and any due a full
+        reconcile) are synced; the others are returned as cached.
+        Tables that fail to sync keep their previously cached data, and their
+        errors are kept in self.errors (and reported on /metrics) until they
+        sync again; if none of the tables could be synced, SyncFailed is raised
+        instead, so no empty tables are returned as data.
+        """
+        full = {table_name for table_name in self.table_names if self._reconcile_due(table_name)}
+        for table_name in full:
+            # Schemas can change between reconciles; re-resolve projections.
+            self.projections.pop(table_name, None)
+        synced = [table_name for table_name in self.table_names
+                  if table_names is None or table_name in table_names or table_name in full]
+        jobs = {table_name: (lambda cursor, table_name=table_name: self._sync_table(cursor, table_name, table_name in full))
+                for table_name in synced}
+        started = time.monotonic()
+        results, errors = fetch_parallel(self.db_params, jobs)
+        for table_name in results:
+            self.errors.pop(table_name, None)
+        self.errors.update(errors)
+        for table_name in errors:
+            REGISTRY.inc("dashboard_table_sync_errors_total", table=table_name)
+        for table_name in self.table_names:
+            REGISTRY.set("dashboard_table_sync_failing", int(table_name in self.errors), table=table_name)
+        if errors and not results:
+            raise SyncFailed(f"no table could be synced: {next(iter(errors.values()))}")
+        self.data.update(results)
+        for table_name, error in errors.items():
+            print(f"Error syncing table '{table_name}': {error}")
+            self.data.setdefault(table_name, pd.DataFrame()) # Keep cached rows on error
+        for table_name in full.intersection(results):
+            self.reconciled[table_name] = started
+        return {table_name: self.data[table_name] for table_name in self.table_names}
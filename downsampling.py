@@ -0,0 +1,73 @@
+import pandas as pd
+
+# --- Downsampling Settings ---
+# Most points a time series chart is drawn with; longer ranges use coarser buckets.
+MAX_POINTS = 400
+# Series longer than this are drawn with WebGL (Scattergl) instead of SVG.
+WEBGL_MIN_POINTS = 1000
+# Bucket sizes from finest to coarsest: (pandas period frequency, label). Daily
+# is the finest resolution the snapshot metrics have.
+BUCKETS = [("D", "Daily"), ("W", "Weekly"), ("M", "Monthly")]
+BUCKET_DAYS = {"D": 1, "W": 7, "M": 30.44}
+
+
+def window_from_relayout(relayout, current=None):
+    """
+    Returns the x range a graph's relayoutData zoomed or panned to, as
+    (start date, end date) ISO strings, None once the user resets the zoom, or
+    current if the event did not change the x axis (e.g. autosize, y-only zoom).
+    """
+    if not relayout:
+        return current
+    if relayout.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        start, end = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif "xaxis.range" in relayout:
+        start, end = relayout["xaxis.range"]
+    else:
+        return current
+    try:
+        start, end = pd.Timestamp(start).floor("D"), pd.Timestamp(end).ceil("D")
+    except (TypeError, ValueError):
+        return current
+    return (start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+
+
+def choose_bucket(days):
+    """The finest bucket that draws a range of the given number of days with at most MAX_POINTS points."""
+    for frequency, label in BUCKETS:
+        if days / BUCKET_DAYS[frequency] <= MAX_POINTS:
+            return frequency, label
+    return BUCKETS[-1]
+
+
+def downsample(df, date_column, value_column, window=None):
+    """
+    Sums a daily series into day, week or month buckets, whichever is finest
+    while keeping the visible range within MAX_POINTS points.
+
+    With a window (start, end), the bucket is chosen for that range and only
+    buckets in and around it (one window width either side, so short pans
+    still show data) are returned. Returns (bucketed DataFrame, bucket label).
+    """
+    dates = pd.to_datetime(df[date_column])
+    if window is not None:
+        start, end = pd.Timestamp(window[0]), pd.Timestamp(window[1])
+        margin = end - start
+        visible = (dates >= start - margin) & (dates <= end + margin)
+        df, dates = df[visible], dates[visible]
+    else:
+        start, end = dates.min(), dates.max()
+    days = (end - start).days + 1 if len(dates) else 0
+    frequency, label = choose_bucket(days)
+    if frequency == "D":
+        return df[[date_column, value_column]].reset_index(drop=True), label
+    buckets = dates.dt.to_period(frequency).dt.start_time
+    bucketed = df[value_column].groupby(buckets.to_numpy()).sum()
+    return pd.DataFrame({date_column: bucketed.index, value_column: bucketed.to_numpy()}), label
+
+
+def window_key(window):
+    """Short text form of a window, for cache keys."""
+    return "full" if window is None else f"{window[0]}/{window[1]}"
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import plotly
+
+from instrumentation import REGISTRY
+
+# --- Figure Cache Settings ---
+# Built figures kept in memory per worker; the least recently used are evicted first.
+FIGURE_CACHE_SIZE = 64
+# Figure files kept on disk for other workers; the oldest are pruned first.
+FIGURE_FILES_MAX = 256
+# Bump whenever chart builders change what they draw, so figures built by an
+# earlier deploy (and still on disk) are not served. The plotly version is part
+# of the key as well, as figure JSON depends on it.
+FIGURE_CACHE_VERSION = 1
+
+
+def cache_key(chart_id, input_hashes):
+    """Key for a chart built from inputs with the given content hashes, by this version of the builders."""
+    versions = [f"v{FIGURE_CACHE_VERSION}", plotly.__version__]
+    digest = hashlib.sha1("|".join([*versions, *input_hashes]).encode()).hexdigest()[:16]
+    return f"{chart_id}-{digest}"
+
+
+class FigureCache:
+    """
+    Memoises built figures as plain JSON-ready dicts.
+
+    Entries are keyed by chart id and the content hashes of the metrics the
+    chart is drawn from, so a chart is rebuilt only when its own inputs change,
+    not on every refresh. If directory is given, figures are also written there
+    as JSON so other workers can reuse them instead of building their own.
+    """
+
+    def __init__(self, directory=None, max_entries=FIGURE_CACHE_SIZE, max_files=FIGURE_FILES_MAX):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, figure):
+        with self._lock:
+            self.entries[key] = figure
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _read_file(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_file(self, key, figure_json):
+        if self.directory is None:
+            return
+        # Unique per thread too: threads of one worker may build the same figure at once.
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(figure_json)
+            os.replace(tmp_path, self._path(key))
+            self._prune_files()
+        except OSError as error:
+            # The figure is still cached in memory; other workers build their own.
+            print(f"Could not write figure '{key}' to the figure cache: {error}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _prune_files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                files.append((os.stat(path).st_mtime, path))
+            except OSError:
+                pass  # Another worker pruned it first
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Another worker pruned it first
+
+    def get_or_build(self, chart_id, input_hashes, build):
+        """
+        Returns the cached figure for chart_id and input_hashes, calling build()
+        (which returns a plotly Figure) only if no worker has built it yet.
+        """
+        key = cache_key(chart_id, input_hashes)
+        with self._lock:
+            figure = self.entries.get(key)
+            if figure is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return figure
+        figure = self._read_file(key)
+        if figure is None:
+            self.misses += 1
+            start = time.perf_counter()
+            fig = build()
+            built = time.perf_counter()
+            figure_json = fig.to_json()
+            REGISTRY.observe("dashboard_chart_build_seconds", built - start, chart=chart_id)
+            REGISTRY.observe("dashboard_chart_serialise_seconds", time.perf_counter() - built, chart=chart_id)
+            REGISTRY.set("dashboard_chart_bytes", len(figure_json), chart=chart_id)
+            figure = json.loads(figure_json)
+            self._write_file(key, figure_json)
+        else:
+            self.hits += 1
+        self._remember(key, figure)
+        return figure
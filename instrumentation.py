@@ -0,0 +1,160 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Instrumentation Settings ---
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# If set, the first refresh cycle this process runs is profiled with cProfile
+# and the stats written to this path (open with pstats or snakeviz).
+PROFILE_REFRESH_PATH = os.environ.get("DASHBOARD_PROFILE_REFRESH")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = [*sorted(labels), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Counters, gauges and histograms for this process, rendered in the
+    Prometheus text format.
+
+    Metrics are declared once with describe() and then updated from any thread.
+    Each gunicorn worker keeps its own registry; series from the refresh cycle
+    (table fetches, metric computes) come from whichever worker refreshed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}  # name -> {"kind", "help", "buckets", "series": {labels: value}}
+
+    def describe(self, name, kind, help_text, buckets=LATENCY_BUCKETS):
+        """Declares a metric; kind is "counter", "gauge" or "histogram"."""
+        with self._lock:
+            self._families.setdefault(name, {"kind": kind, "help": help_text, "buckets": buckets, "series": {}})
+
+    def _series(self, name, labels):
+        return self._families[name]["series"], tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            series, key = self._series(name, labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            series, key = self._series(name, labels)
+            series[key] = value
+
+    def observe(self, name, value, **labels):
+        """Adds one observation to a histogram."""
+        with self._lock:
+            family = self._families[name]
+            series, key = self._series(name, labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"buckets": [0] * len(family["buckets"]), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(family["buckets"]):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the with block in a histogram, also if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, family in self._families.items():
+                if not family["series"]:
+                    continue
+                lines.append(f"# HELP {name} {family['help']}")
+                lines.append(f"# TYPE {name} {family['kind']}")
+                for labels, value in sorted(family["series"].items()):
+                    if family["kind"] != "histogram":
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                        continue
+                    for bound, count in zip(family["buckets"], value["buckets"]):
+                        lines.append(f"{name}_bucket{_labels(labels, [('le', _number(float(bound)))])} {count}")
+                    lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+                    lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the database, metrics, figure cache and app modules
+REGISTRY = Registry()
+REGISTRY.describe("dashboard_table_fetch_seconds", "histogram", "Time to query a table and build its DataFrame.")
+REGISTRY.describe("dashboard_table_fetch_rows_total", "counter", "Rows fetched per table.")
+REGISTRY.describe("dashboard_table_fetch_bytes_total", "counter", "In-memory size of the rows fetched per table.")
+REGISTRY.describe("dashboard_table_memory_bytes", "gauge", "Memory used by each cached table DataFrame.")
+REGISTRY.describe("dashboard_table_sync_errors_total", "counter", "Failed syncs per table.")
+REGISTRY.describe("dashboard_table_sync_failing", "gauge",
+                  "1 while a table's last sync failed and its cached rows are being served instead.")
+REGISTRY.describe("dashboard_metric_compute_seconds", "histogram", "Time to compute one metric, by backend.")
+REGISTRY.describe("dashboard_refresh_seconds", "histogram", "Time of a whole refresh cycle.")
+REGISTRY.describe("dashboard_chart_build_seconds", "histogram", "Time to build a chart's figure from its metrics.")
+REGISTRY.describe("dashboard_chart_serialise_seconds", "histogram", "Time to serialise a chart's figure to JSON.")
+REGISTRY.describe("dashboard_chart_bytes", "gauge", "Size of each chart's serialised figure.")
+REGISTRY.describe("dashboard_callback_seconds", "histogram", "Latency of each Dash callback.")
+REGISTRY.describe("dashboard_callback_unchanged_total", "counter",
+                  "Callbacks answered with no update because their inputs had not changed.")
+REGISTRY.describe("dashboard_figure_cache_hits_total", "counter", "Figures served from the figure cache.")
+REGISTRY.describe("dashboard_figure_cache_misses_total", "counter", "Figures that had to be built.")
+REGISTRY.describe("dashboard_snapshot_version", "gauge", "Version of the snapshot this worker is serving.")
+REGISTRY.describe("dashboard_snapshot_age_seconds", "gauge", "Age of the snapshot this worker is serving.")
+
+
+def frame_bytes(df):
+    """Memory used by a DataFrame's columns, including the strings they point to."""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+class RefreshProfiler:
+    """
+    Wraps a refresh function so its first call is run under cProfile and the
+    stats are written to path. Later calls run unprofiled. Only the calling
+    thread is profiled: parallel table fetches show up as waits on their
+    futures, and their own timings are in dashboard_table_fetch_seconds.
+    """
+
+    def __init__(self, refresh, path):
+        self.refresh = refresh
+        self.path = path
+        self.done = False
+
+    def __call__(self, *args):
+        if self.done:
+            return self.refresh(*args)
+        self.done = True
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(self.refresh, *args)
+        finally:
+            profile.dump_stats(self.path)
+            print(f"Wrote refresh profile to '{self.path}'.")
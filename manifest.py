@@ -0,0 +1,67 @@
+# --- Chart Data Dependencies ---
+# Each KPI and chart declares the tables and columns it reads, including those
+# its filtered rollups and queries read (creation dates, categories, venues). Only these are
+# loaded from the database, so tables no chart references are never fetched.
+_EVENT_CATEGORIES = {
+    "category_mappings": ["eventId", "categoryId"],
+    "categories": ["id", "name"],
+}
+
+CHART_DEPENDENCIES = {
+    "kpi-total-events": {"events": ["id", "createdAt"], **_EVENT_CATEGORIES},
+    "kpi-total-users": {"users": ["id", "createdAt"]},
+    "kpi-total-performers": {"performers": ["id"]},
+    "kpi-total-tips": {"performer_tips": ["tipAmount", "createdAt"]},
+    "event-status-pie": {"events": ["id", "eventStatus", "createdAt"], **_EVENT_CATEGORIES},
+    "new-users-line": {"users": ["createdAt"]},
+    "event-ticket-sales": {
+        "events": ["id", "eventName", "createdAt"],
+        "event_tickets": ["eventId", "totalTickets", "availableTickets"],
+        **_EVENT_CATEGORIES,
+    },
+    "event-price-distribution": {
+        "event_tickets": ["eventId", "price"],
+        "events": ["id", "createdAt"],
+        **_EVENT_CATEGORIES,
+    },
+    "total-tips-over-time": {"performer_tips": ["createdAt", "tipAmount"]},
+    "top-tipped-performers": {
+        "performer_tips": ["performerId", "tipAmount", "createdAt"],
+        "performers": ["id", "userId"],
+        "users": ["id", "email"],
+    },
+    "total-transactions-over-time": {"mpesa_stk_push_payments": ["createdAt", "transactionAmount"]},
+    "events-by-category": {"events": ["id", "createdAt"], **_EVENT_CATEGORIES},
+    "users-by-registration-month": {"users": ["createdAt"]},
+    "venue-booking-status-pie": {
+        "venue_bookings": ["bookingStatus", "createdAt", "venueId"],
+        "venues": ["id", "name"],
+    },
+}
+
+
+def required_columns(chart_ids=None):
+    """
+    Returns {table: [columns]} covering everything the given charts read.
+    Defaults to all charts in CHART_DEPENDENCIES.
+    """
+    if chart_ids is None:
+        chart_ids = CHART_DEPENDENCIES.keys()
+    columns = {}
+    for chart_id in chart_ids:
+        for table_name, table_columns in CHART_DEPENDENCIES[chart_id].items():
+            merged = columns.setdefault(table_name, [])
+            merged.extend(c for c in table_columns if c not in merged)
+    return columns
+
+
+def required_tables(table_names, chart_ids=None):
+    """Filters table_names down to the tables the given charts read, keeping their order."""
+    needed = required_columns(chart_ids)
+    return [table_name for table_name in table_names if table_name in needed]
+
+
+def charts_reading(table_names):
+    """Ids of the KPIs and charts that read any of table_names."""
+    table_names = set(table_names)
+    return [chart_id for chart_id, tables in CHART_DEPENDENCIES.items() if table_names & tables.keys()]
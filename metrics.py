@@ -0,0 +1,641 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from database import fetch_parallel
+from instrumentation import REGISTRY
+
+# --- Metrics Settings ---
+# "sql" runs each aggregate in PostgreSQL and transfers only the result set.
+# "pandas" syncs the raw tables and aggregates them in-process.
+METRICS_BACKEND = os.environ.get("DASHBOARD_METRICS_BACKEND", "sql")
+TOP_N = 10
+PRICE_BINS = 20
+UNKNOWN_USER = "Unknown User"
+# Separator of the category names in a rollup's "categories" column.
+CATEGORY_SEPARATOR = "|"
+
+# --- SQL Implementations ---
+# Every query returns exactly the columns of its pandas counterpart below.
+SQL_METRICS = {
+    "total_events": 'SELECT COUNT(*) AS value FROM events',
+    "total_users": 'SELECT COUNT(*) AS value FROM users',
+    "total_performers": 'SELECT COUNT(*) AS value FROM performers',
+    "total_tips": 'SELECT COALESCE(SUM("tipAmount"), 0)::float8 AS value FROM performer_tips',
+    "event_status_counts": '''
+        SELECT "eventStatus" AS "Status", COUNT(*) AS "Count"
+        FROM events
+        WHERE "eventStatus" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+    ''',
+    "monthly_new_users": '''
+        SELECT to_char(date_trunc('month', "createdAt"), 'YYYY-MM') AS month, COUNT(*) AS count
+        FROM users
+        WHERE "createdAt" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    ''',
+    "daily_new_users": '''
+        SELECT "createdAt"::date AS date, COUNT(*) AS count
+        FROM users
+        WHERE "createdAt" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    ''',
+    "top_events_by_tickets_sold": '''
+        SELECT e."eventName" AS "eventName",
+               COALESCE(SUM(t."totalTickets" - t."availableTickets"), 0)::float8 AS tickets_sold
+        FROM events e
+        LEFT JOIN event_tickets t ON t."eventId" = e.id
+        WHERE e."eventName" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+        LIMIT %(limit)s
+    ''',
+    "ticket_price_histogram": '''
+        WITH bounds AS (
+            SELECT MIN(price)::float8 AS lo, MAX(price)::float8 AS hi
+            FROM event_tickets
+        )
+        SELECT CASE WHEN b.hi > b.lo
+                    THEN LEAST(width_bucket(t.price::float8, b.lo, b.hi, %(bins)s), %(bins)s)
+                    ELSE %(bins)s / 2 + 1
+               END AS bucket,
+               COUNT(*) AS count, MIN(b.lo) AS lo, MIN(b.hi) AS hi
+        FROM event_tickets t CROSS JOIN bounds b
+        WHERE t.price IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    ''',
+    "daily_tips": '''
+        SELECT "createdAt"::date AS date, SUM("tipAmount")::float8 AS amount
+        FROM performer_tips
+        WHERE "createdAt" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    ''',
+    "top_tipped_performers": '''
+        SELECT COALESCE(u.email, %(unknown)s) AS performer_email,
+               COALESCE(SUM(pt."tipAmount"), 0)::float8 AS "tipAmount"
+        FROM performer_tips pt
+        LEFT JOIN performers p ON p.id = pt."performerId"
+        LEFT JOIN users u ON u.id = p."userId"
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+        LIMIT %(limit)s
+    ''',
+    "daily_transactions": '''
+        SELECT "createdAt"::date AS date, SUM("transactionAmount")::float8 AS amount
+        FROM mpesa_stk_push_payments
+        WHERE "createdAt" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    ''',
+    "events_by_category": '''
+        SELECT c.name AS "Category", COUNT(DISTINCT e.id) AS "Count"
+        FROM events e
+        JOIN category_mappings m ON m."eventId" = e.id
+        JOIN categories c ON c.id = m."categoryId"
+        WHERE c.name IS NOT NULL
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+    ''',
+    "venue_booking_status_counts": '''
+        SELECT "bookingStatus" AS "Status", COUNT(*) AS "Count"
+        FROM venue_bookings
+        WHERE "bookingStatus" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+    ''',
+}
+
+# --- SQL Rollups ---
+# Per-snapshot pre-aggregates the filter controls are answered from (see rollups.py).
+# An event's categories are its distinct category names, sorted by code point and joined.
+_EVENT_CATEGORIES = '''
+    WITH event_categories AS (
+        SELECT m."eventId", string_agg(DISTINCT c.name COLLATE "C", %(separator)s ORDER BY c.name COLLATE "C") AS categories
+        FROM category_mappings m
+        JOIN categories c ON c.id = m."categoryId"
+        WHERE c.name IS NOT NULL
+        GROUP BY 1
+    )
+'''
+
+SQL_METRICS.update({
+    "rollup_events": _EVENT_CATEGORIES + '''
+        SELECT e."createdAt"::date AS date, e."eventStatus" AS status,
+               COALESCE(ec.categories, '') AS categories, COUNT(*) AS count
+        FROM events e
+        LEFT JOIN event_categories ec ON ec."eventId" = e.id
+        GROUP BY 1, 2, 3
+    ''',
+    "rollup_ticket_prices": _EVENT_CATEGORIES + ''',
+        bounds AS (
+            SELECT MIN(price)::float8 AS lo, MAX(price)::float8 AS hi
+            FROM event_tickets
+        )
+        SELECT e."createdAt"::date AS date, COALESCE(ec.categories, '') AS categories,
+               CASE WHEN b.hi > b.lo
+                    THEN LEAST(width_bucket(t.price::float8, b.lo, b.hi, %(bins)s), %(bins)s)
+                    ELSE %(bins)s / 2 + 1
+               END AS bucket,
+               COUNT(*) AS count, MIN(b.lo) AS lo, MIN(b.hi) AS hi
+        FROM event_tickets t CROSS JOIN bounds b
+        LEFT JOIN events e ON e.id = t."eventId"
+        LEFT JOIN event_categories ec ON ec."eventId" = e.id
+        WHERE t.price IS NOT NULL
+        GROUP BY 1, 2, 3
+    ''',
+    "rollup_venue_bookings": '''
+        SELECT "createdAt"::date AS date, "venueId" AS venue_id, "bookingStatus" AS status, COUNT(*) AS count
+        FROM venue_bookings
+        WHERE "bookingStatus" IS NOT NULL
+        GROUP BY 1, 2, 3
+    ''',
+    "venue_names": 'SELECT id AS venue_id, name AS venue_name FROM venues',
+})
+
+# --- Filtered SQL Queries ---
+# Filtered top-N lists have no compact rollup: their grain (performer or event
+# per day) is about as large as the raw table. Their filtered versions are
+# queried on demand instead (see rollups.py) and return the same columns as the
+# unfiltered metric. %(start)s and %(end)s are inclusive dates or NULL, and
+# %(categories)s is a list of category names or NULL.
+FILTERED_SQL_METRICS = {
+    "top_events_by_tickets_sold": '''
+        SELECT e."eventName" AS "eventName",
+               COALESCE(SUM(t."totalTickets" - t."availableTickets"), 0)::float8 AS tickets_sold
+        FROM events e
+        LEFT JOIN event_tickets t ON t."eventId" = e.id
+        WHERE e."eventName" IS NOT NULL
+          AND (%(start)s::date IS NULL OR e."createdAt" >= %(start)s::date)
+          AND (%(end)s::date IS NULL OR e."createdAt" < %(end)s::date + 1)
+          AND (%(categories)s::text[] IS NULL OR EXISTS (
+                SELECT 1
+                FROM category_mappings m
+                JOIN categories c ON c.id = m."categoryId"
+                WHERE m."eventId" = e.id AND c.name = ANY(%(categories)s::text[])))
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+        LIMIT %(limit)s
+    ''',
+    "top_tipped_performers": '''
+        SELECT COALESCE(u.email, %(unknown)s) AS performer_email,
+               COALESCE(SUM(pt."tipAmount"), 0)::float8 AS "tipAmount"
+        FROM performer_tips pt
+        LEFT JOIN performers p ON p.id = pt."performerId"
+        LEFT JOIN users u ON u.id = p."userId"
+        WHERE (%(start)s::date IS NULL OR pt."createdAt" >= %(start)s::date)
+          AND (%(end)s::date IS NULL OR pt."createdAt" < %(end)s::date + 1)
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+        LIMIT %(limit)s
+    ''',
+}
+
+SQL_PARAMS = {"limit": TOP_N, "bins": PRICE_BINS, "unknown": UNKNOWN_USER, "separator": CATEGORY_SEPARATOR}
+
+
+def _run_sql_metric(cursor, name, query=None, params=SQL_PARAMS, backend="sql"):
+    with REGISTRY.timer("dashboard_metric_compute_seconds", metric=name, backend=backend):
+        cursor.execute(query or SQL_METRICS[name], params)
+        rows = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    return _normalise(name, pd.DataFrame(rows, columns=columns))
+
+
+def fetch_sql_metrics(db_params, metric_names=None):
+    """
+    Runs the aggregate query of each metric in the database, several at once.
+    Returns a dictionary of small DataFrames keyed by metric name.
+    """
+    if metric_names is None:
+        metric_names = SQL_METRICS.keys()
+    jobs = {name: (lambda cursor, name=name: _run_sql_metric(cursor, name)) for name in metric_names}
+    results, errors = fetch_parallel(db_params, jobs)
+    for name, error in errors.items():
+        print(f"Error computing metric '{name}': {error}")
+    return results
+
+
+def fetch_filtered_sql_metric(db_params, name, filters):
+    """
+    Runs the filtered query of metric name with filters (as built by
+    rollups.filters_from_controls) applied. Returns a DataFrame; raises if the
+    query fails.
+    """
+    start, end = filters.get("date", (None, None))
+    categories = list(filters["category"]) if "category" in filters else None
+    params = {**SQL_PARAMS, "start": start, "end": end, "categories": categories}
+    job = lambda cursor: _run_sql_metric(cursor, name, FILTERED_SQL_METRICS[name], params, backend="sql-filtered")
+    results, errors = fetch_parallel(db_params, {name: job})
+    if name in errors:
+        raise errors[name]
+    return results[name]
+
+
+# --- Pandas Implementations ---
+
+def _has(df, *columns):
+    return df is not None and not df.empty and all(c in df.columns for c in columns)
+
+
+class PandasContext:
+    """
+    Data derived once per snapshot and shared by all pandas metrics.
+
+    Timestamps are parsed once per column and id-indexed lookups are built once
+    per table, on first use, instead of inside every metric that needs them.
+    Table DataFrames are only read, never copied.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self._local_days = {}
+        self._lookups = {}
+        self._category_pairs = None
+        self._event_categories = None
+
+    def table(self, table_name, *columns):
+        """Returns the table if it is loaded and has the given columns, else None."""
+        df = self.tables.get(table_name)
+        return df if _has(df, *columns) else None
+
+    def local_days(self, table_name, column="createdAt"):
+        """
+        Day numbers (days since 1970-01-01, NaN for missing) of a timestamp column
+        in the session time zone, matching how PostgreSQL buckets it with ::date.
+        Numeric keys group far faster than datetime64 ones.
+        """
+        key = (table_name, column)
+        if key not in self._local_days:
+            times = pd.to_datetime(self.tables[table_name][column])
+            if times.dt.tz is not None:
+                times = times.dt.tz_localize(None)
+            days = times.to_numpy().astype("datetime64[D]").astype("int64").astype("float64")
+            days[times.isna().to_numpy()] = np.nan
+            self._local_days[key] = days
+        return self._local_days[key]
+
+    def lookup(self, table_name, column, ids):
+        """
+        Returns table_name[column] for each of ids (NaN where an id is unknown).
+        The table is sorted by id once, then each lookup is a binary search.
+        """
+        key = (table_name, column)
+        if key not in self._lookups:
+            df = self.tables[table_name]
+            table_ids, values = df["id"].to_numpy(), df[column].to_numpy()
+            if not np.all(table_ids[:-1] <= table_ids[1:]):  # Usually already in id order
+                order = np.argsort(table_ids, kind="stable")
+                table_ids, values = table_ids[order], values[order]
+            self._lookups[key] = (table_ids, values)
+        sorted_ids, values = self._lookups[key]
+        ids = np.asarray(ids)
+        if len(sorted_ids) == 0:
+            return pd.Series(np.nan, index=range(len(ids)), dtype=object)
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == ids
+        return pd.Series(values[positions]).where(found)
+
+    def category_pairs(self):
+        """
+        Distinct (eventId, name) pairs of every event and the names of its
+        categories, sorted; None if the category tables are missing. Duplicate
+        mappings, or two categories with one name, count an event only once.
+        """
+        if self._category_pairs is None:
+            mappings_df = self.table("category_mappings", "eventId", "categoryId")
+            if mappings_df is None or self.table("categories", "id", "name") is None:
+                return None
+            names = self.lookup("categories", "name", mappings_df["categoryId"].to_numpy())
+            pairs = pd.DataFrame({"eventId": mappings_df["eventId"].to_numpy(), "name": names.to_numpy()})
+            self._category_pairs = pairs.dropna().drop_duplicates().sort_values(["eventId", "name"])
+        return self._category_pairs
+
+    def event_categories(self, event_ids):
+        """
+        The categories of each of event_ids, as their distinct names sorted and
+        joined by CATEGORY_SEPARATOR ("" for events without any).
+        """
+        if self._event_categories is None:
+            pairs = self.category_pairs()
+            if pairs is None:
+                self._event_categories = pd.Series(dtype=object)
+            else:
+                self._event_categories = pairs.groupby("eventId", sort=False)["name"].agg(CATEGORY_SEPARATOR.join)
+        categories = self._event_categories.reindex(np.asarray(event_ids))
+        return categories.fillna("").to_numpy()
+
+
+def _days_to_dates(days):
+    return pd.to_datetime(np.asarray(days, dtype="int64"), unit="D")
+
+
+def _nullable_days_to_dates(days):
+    """Like _days_to_dates, with NaN days becoming NaT."""
+    return pd.to_datetime(np.asarray(days, dtype="float64"), unit="D")
+
+
+def _scalar(value):
+    return pd.DataFrame({"value": [value]})
+
+
+def _status_counts(df, column):
+    if not _has(df, column):
+        return pd.DataFrame(columns=["Status", "Count"])
+    counts = df[column].value_counts().reset_index()
+    counts.columns = ["Status", "Count"]
+    # Categorical columns also count unused categories; report plain labels like SQL does
+    counts = counts[counts["Count"] > 0].astype({"Status": object})
+    return _sorted(counts, "Status", "Count")
+
+
+def _sorted(df, label, value):
+    """Sorts like the SQL ORDER BY value DESC, label."""
+    return df.sort_values(by=[value, label], ascending=[False, True]).reset_index(drop=True)
+
+
+def _ranked(df, label, value):
+    """Sorts like _sorted and keeps the top TOP_N rows."""
+    return _sorted(df, label, value).head(TOP_N)
+
+
+def _daily_sum(context, table_name, column):
+    df = context.table(table_name, "createdAt", column)
+    if df is None:
+        return pd.DataFrame(columns=["date", "amount"])
+    daily = pd.to_numeric(df[column]).groupby(context.local_days(table_name)).sum()
+    return pd.DataFrame({"date": _days_to_dates(daily.index), "amount": daily.to_numpy()})
+
+
+def histogram_frame(lo, hi, bucket_counts, bins=PRICE_BINS):
+    """Expands {bucket: count} (1-based) into one row per bin with its edges."""
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, bins + 1)
+    counts = [int(bucket_counts.get(i + 1, 0)) for i in range(bins)]
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+
+
+def _ticket_price_histogram(context):
+    event_tickets_df = context.table("event_tickets", "price")
+    if event_tickets_df is None:
+        return histogram_frame(0.0, 0.0, {}).iloc[0:0]
+    prices = pd.to_numeric(event_tickets_df["price"]).dropna().astype(float)
+    if prices.empty:
+        return histogram_frame(0.0, 0.0, {}).iloc[0:0]
+    counts, edges = np.histogram(prices, bins=PRICE_BINS)
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts.astype(int)})
+
+
+def _monthly_new_users(context):
+    if context.table("users", "createdAt") is None:
+        return pd.DataFrame(columns=["month", "count"])
+    # Count per day first, then roll the (few) distinct days up into months
+    daily = pd.Series(context.local_days("users")).value_counts()
+    months = _days_to_dates(daily.index).strftime("%Y-%m")
+    monthly = daily.groupby(months).sum().sort_index()
+    return pd.DataFrame({"month": monthly.index, "count": monthly.to_numpy()})
+
+
+def _daily_new_users(context):
+    if context.table("users", "createdAt") is None:
+        return pd.DataFrame(columns=["date", "count"])
+    daily = pd.Series(context.local_days("users")).value_counts().sort_index()
+    return pd.DataFrame({"date": _days_to_dates(daily.index), "count": daily.to_numpy()})
+
+
+def _top_events_by_tickets_sold(context):
+    events_df = context.table("events", "id", "eventName")
+    event_tickets_df = context.table("event_tickets", "eventId", "totalTickets", "availableTickets")
+    if events_df is None or event_tickets_df is None:
+        return pd.DataFrame(columns=["eventName", "tickets_sold"])
+    # Aggregate tickets per event first; events without tickets count as 0 sold
+    sold = (event_tickets_df["totalTickets"] - event_tickets_df["availableTickets"]).groupby(
+        event_tickets_df["eventId"].to_numpy(), sort=False).sum()
+    per_event = pd.Series(sold.to_numpy(), index=sold.index).reindex(events_df["id"].to_numpy(), fill_value=0)
+    sales = per_event.groupby(events_df["eventName"].to_numpy(), sort=False).sum().astype(float).reset_index()
+    sales.columns = ["eventName", "tickets_sold"]
+    return _ranked(sales, "eventName", "tickets_sold")
+
+
+def _top_tipped_performers(context):
+    tips_df = context.table("performer_tips", "performerId", "tipAmount")
+    if tips_df is None or context.table("performers", "id", "userId") is None:
+        return pd.DataFrame(columns=["performer_email", "tipAmount"])
+    # Sum tips per performer first, then look up emails for those performers only
+    tips = pd.to_numeric(tips_df["tipAmount"]).groupby(tips_df["performerId"].to_numpy(), sort=False).sum()
+    performer_ids, amounts = tips.index.to_numpy(), tips.to_numpy()
+    missing_performer = tips_df["performerId"].isna()
+    if missing_performer.any():
+        performer_ids = np.append(performer_ids, np.nan)
+        amounts = np.append(amounts, pd.to_numeric(tips_df.loc[missing_performer, "tipAmount"]).sum())
+    user_ids = context.lookup("performers", "userId", performer_ids)
+    if context.table("users", "id", "email") is not None:
+        emails = context.lookup("users", "email", user_ids.to_numpy(dtype="float64")).fillna(UNKNOWN_USER)
+    else:
+        emails = pd.Series(UNKNOWN_USER, index=range(len(amounts)))
+    by_email = pd.Series(amounts).groupby(emails.to_numpy(), sort=False).sum().astype(float).reset_index()
+    by_email.columns = ["performer_email", "tipAmount"]
+    return _ranked(by_email, "performer_email", "tipAmount")
+
+
+def _events_by_category(context):
+    events_df = context.table("events", "id")
+    pairs = context.category_pairs()
+    if events_df is None or pairs is None:
+        return pd.DataFrame(columns=["Category", "Count"])
+    # Each event counts once per category name, like the rollup the filters read
+    counts = pairs.loc[pairs["eventId"].isin(events_df["id"]), "name"].value_counts().reset_index()
+    counts.columns = ["Category", "Count"]
+    return _sorted(counts, "Category", "Count")
+
+
+# --- Pandas Rollups ---
+
+def _rollup(keys, values, aggregate):
+    """Groups values by the key columns, keeping missing keys as their own groups, like SQL GROUP BY."""
+    grouped = pd.DataFrame({**keys, "value": values}).groupby(list(keys), dropna=False, sort=False)["value"]
+    rollup = getattr(grouped, aggregate)().reset_index()
+    if "date" in rollup.columns:
+        rollup["date"] = _nullable_days_to_dates(rollup["date"])
+    return rollup
+
+
+def _rollup_events(context):
+    events_df = context.table("events", "id", "createdAt", "eventStatus")
+    if events_df is None:
+        return pd.DataFrame(columns=["date", "status", "categories", "count"])
+    keys = {
+        "date": context.local_days("events"),
+        "status": events_df["eventStatus"].astype(object).to_numpy(),
+        "categories": context.event_categories(events_df["id"].to_numpy()),
+    }
+    return _rollup(keys, np.ones(len(events_df), dtype="int64"), "sum").rename(columns={"value": "count"})
+
+
+def _rollup_ticket_prices(context):
+    event_tickets_df = context.table("event_tickets", "eventId", "price")
+    events_df = context.table("events", "id", "createdAt")
+    columns = ["date", "categories", "bucket", "count", "lo", "hi"]
+    if event_tickets_df is None:
+        return pd.DataFrame(columns=columns)
+    prices = pd.to_numeric(event_tickets_df["price"]).astype(float)
+    priced = prices.notna().to_numpy()
+    if not priced.any():
+        return pd.DataFrame(columns=columns)
+    prices = prices.to_numpy()[priced]
+    lo, hi = prices.min(), prices.max()
+    if hi > lo:
+        buckets = np.minimum(np.floor(PRICE_BINS * ((prices - lo) / (hi - lo))).astype("int64") + 1, PRICE_BINS)
+    else:
+        buckets = np.full(len(prices), PRICE_BINS // 2 + 1)
+    event_ids = event_tickets_df["eventId"].to_numpy(dtype="float64")[priced]
+    if events_df is not None:
+        days = pd.Series(context.local_days("events"), index=events_df["id"].to_numpy()).reindex(event_ids).to_numpy()
+        known = np.isin(event_ids, events_df["id"].to_numpy())
+    else:
+        days, known = np.full(len(event_ids), np.nan), np.zeros(len(event_ids), dtype=bool)
+    categories = np.where(known, context.event_categories(event_ids), "")
+    rollup = _rollup({"date": days, "categories": categories, "bucket": buckets},
+                     np.ones(len(buckets), dtype="int64"), "sum").rename(columns={"value": "count"})
+    return rollup.assign(lo=float(lo), hi=float(hi))
+
+
+def _rollup_venue_bookings(context):
+    bookings_df = context.table("venue_bookings", "createdAt", "venueId", "bookingStatus")
+    if bookings_df is None:
+        return pd.DataFrame(columns=["date", "venue_id", "status", "count"])
+    statuses = bookings_df["bookingStatus"].astype(object).to_numpy()
+    has_status = pd.notna(statuses)
+    keys = {
+        "date": context.local_days("venue_bookings")[has_status],
+        "venue_id": bookings_df["venueId"].to_numpy(dtype="float64")[has_status],
+        "status": statuses[has_status],
+    }
+    return _rollup(keys, np.ones(int(has_status.sum()), dtype="int64"), "sum").rename(columns={"value": "count"})
+
+
+def _venue_names(context):
+    venues_df = context.table("venues", "id", "name")
+    if venues_df is None:
+        return pd.DataFrame(columns=["venue_id", "venue_name"])
+    return pd.DataFrame({"venue_id": venues_df["id"].to_numpy(), "venue_name": venues_df["name"].to_numpy()})
+
+
+PANDAS_METRICS = {
+    "total_events": lambda context: _scalar(len(context.tables.get("events", pd.DataFrame()))),
+    "total_users": lambda context: _scalar(len(context.tables.get("users", pd.DataFrame()))),
+    "total_performers": lambda context: _scalar(len(context.tables.get("performers", pd.DataFrame()))),
+    "total_tips": lambda context: _scalar(
+        float(pd.to_numeric(context.tables["performer_tips"]["tipAmount"]).sum())
+        if context.table("performer_tips", "tipAmount") is not None else 0.0),
+    "event_status_counts": lambda context: _status_counts(context.tables.get("events"), "eventStatus"),
+    "monthly_new_users": _monthly_new_users,
+    "daily_new_users": _daily_new_users,
+    "top_events_by_tickets_sold": _top_events_by_tickets_sold,
+    "ticket_price_histogram": _ticket_price_histogram,
+    "daily_tips": lambda context: _daily_sum(context, "performer_tips", "tipAmount"),
+    "top_tipped_performers": _top_tipped_performers,
+    "daily_transactions": lambda context: _daily_sum(context, "mpesa_stk_push_payments", "transactionAmount"),
+    "events_by_category": _events_by_category,
+    "venue_booking_status_counts": lambda context: _status_counts(context.tables.get("venue_bookings"), "bookingStatus"),
+    "rollup_events": _rollup_events,
+    "rollup_ticket_prices": _rollup_ticket_prices,
+    "rollup_venue_bookings": _rollup_venue_bookings,
+    "venue_names": _venue_names,
+}
+
+# Key columns of each rollup; both backends' rows are put in this order.
+ROLLUP_KEYS = {
+    "rollup_events": ["date", "status", "categories"],
+    "rollup_ticket_prices": ["date", "categories", "bucket"],
+    "rollup_venue_bookings": ["date", "venue_id", "status"],
+    "venue_names": ["venue_id"],
+}
+
+
+def compute_pandas_metrics(tables, metric_names=None):
+    """
+    Computes each metric from already loaded table DataFrames, sharing one
+    PandasContext so timestamps and lookups are prepared once per snapshot.
+    Returns a dictionary of small DataFrames keyed by metric name.
+    """
+    if metric_names is None:
+        metric_names = PANDAS_METRICS.keys()
+    context = PandasContext(tables)
+    results = {}
+    for name in metric_names:
+        try:
+            with REGISTRY.timer("dashboard_metric_compute_seconds", metric=name, backend="pandas"):
+                results[name] = _normalise(name, PANDAS_METRICS[name](context))
+        except Exception as error:
+            print(f"Error computing metric '{name}': {error}")
+    return results
+
+
+def _normalise(name, df):
+    """Gives both backends' results the same shape so they can be compared and plotted alike."""
+    if name == "ticket_price_histogram" and "bucket" in df.columns:
+        if df.empty:
+            return histogram_frame(0.0, 0.0, {}).iloc[0:0]
+        bucket_counts = dict(zip(df["bucket"].astype(int), df["count"]))
+        return histogram_frame(float(df["lo"].iloc[0]), float(df["hi"].iloc[0]), bucket_counts)
+    if name in ("daily_tips", "daily_transactions", "daily_new_users") and not df.empty:
+        df = df.assign(date=pd.to_datetime(df["date"]))
+    if name in ROLLUP_KEYS:
+        return _normalise_rollup(df, ROLLUP_KEYS[name])
+    return df.reset_index(drop=True)
+
+
+def _normalise_rollup(df, keys):
+    """Types a rollup's columns alike on both backends and sorts it by its keys, missing keys last."""
+    df = df.copy()
+    for column in df.columns:
+        if column == "date":
+            df[column] = pd.to_datetime(df[column])
+        elif column in ("performer_id", "venue_id", "bucket"):
+            df[column] = pd.to_numeric(df[column]).astype("float64")
+        elif df[column].dtype == object or isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object).where(df[column].notna(), None)
+    return df.sort_values(keys, na_position="last", kind="mergesort").reset_index(drop=True)
+
+
+def compare_backends(db_params, tables):
+    """
+    Computes every metric with both backends and returns {metric name: message}
+    for each metric whose results differ. An empty dict means both paths agree.
+    """
+    sql_results = fetch_sql_metrics(db_params)
+    pandas_results = compute_pandas_metrics(tables)
+    mismatches = {}
+    for name in SQL_METRICS:
+        if name not in sql_results or name not in pandas_results:
+            mismatches[name] = "metric failed on one backend"
+            continue
+        try:
+            pd.testing.assert_frame_equal(sql_results[name], pandas_results[name],
+                                          check_dtype=False, check_exact=False)
+        except AssertionError as error:
+            mismatches[name] = str(error)
+    return mismatches
+
+
+# --- Backend comparison against a (local) database ---
+# Usage: python metrics.py "dbname=beatbnk_db host=localhost user=postgres"
+if __name__ == '__main__':
+    from database import IncrementalSync, tables_to_query
+    from manifest import required_columns, required_tables
+
+    params = {"dsn": sys.argv[1]}
+    tables = IncrementalSync(params, required_tables(tables_to_query), columns=required_columns()).refresh()
+    mismatches = compare_backends(params, tables)
+    for name, message in mismatches.items():
+        print(f"MISMATCH {name}:\n{message}\n")
+    print(f"{len(SQL_METRICS) - len(mismatches)}/{len(SQL_METRICS)} metrics match.")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,268 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from database import db_connection_params
+from metrics import CATEGORY_SEPARATOR, _scalar, _sorted, fetch_filtered_sql_metric, histogram_frame
+
+# --- Filter Settings ---
+# Filters each metric responds to. Metrics not listed ignore every filter.
+# "date" is the creation date of the events, users, tips, payments or bookings counted.
+FILTER_DIMENSIONS = {
+    "total_events": {"date", "category"},
+    "event_status_counts": {"date", "category"},
+    "events_by_category": {"date", "category"},
+    "top_events_by_tickets_sold": {"date", "category"},
+    "ticket_price_histogram": {"date", "category"},
+    "total_users": {"date"},
+    "daily_new_users": {"date"},
+    "monthly_new_users": {"date"},
+    "total_tips": {"date"},
+    "daily_tips": {"date"},
+    "top_tipped_performers": {"date"},
+    "daily_transactions": {"date"},
+    "venue_booking_status_counts": {"date", "venue"},
+}
+
+# Filtered metrics queried from the database on demand (see FILTERED_SQL_METRICS
+# in metrics.py), as their rollups would be about as large as the raw tables.
+# Results are reused for the rest of the snapshot they were queried under.
+QUERY_METRICS = {"top_events_by_tickets_sold", "top_tipped_performers"}
+
+# Snapshot metrics each filtered metric is computed from.
+ROLLUP_INPUTS = {
+    "total_events": ["rollup_events"],
+    "event_status_counts": ["rollup_events"],
+    "events_by_category": ["rollup_events"],
+    "top_events_by_tickets_sold": [],
+    "ticket_price_histogram": ["rollup_ticket_prices"],
+    "total_users": ["daily_new_users"],
+    "daily_new_users": ["daily_new_users"],
+    "monthly_new_users": ["daily_new_users"],
+    "total_tips": ["daily_tips"],
+    "daily_tips": ["daily_tips"],
+    "top_tipped_performers": [],
+    "daily_transactions": ["daily_transactions"],
+    "venue_booking_status_counts": ["rollup_venue_bookings", "venue_names"],
+}
+
+
+def filters_from_controls(start_date, end_date, categories, venues):
+    """Builds the filters dict from the control values, leaving out filters that are not set."""
+    filters = {}
+    if start_date or end_date:
+        filters["date"] = (start_date[:10] if start_date else None, end_date[:10] if end_date else None)
+    if categories:
+        filters["category"] = tuple(sorted(categories))
+    if venues:
+        filters["venue"] = tuple(sorted(venues))
+    return filters
+
+
+def applicable_filters(filters, metric_names):
+    """The subset of filters that affects any of metric_names."""
+    dimensions = set().union(*(FILTER_DIMENSIONS.get(name, set()) for name in metric_names))
+    return {dimension: value for dimension, value in filters.items() if dimension in dimensions}
+
+
+def rollup_inputs(metric_names):
+    """Snapshot metrics that the filtered versions of metric_names read."""
+    names = []
+    for name in metric_names:
+        names.extend(rollup for rollup in ROLLUP_INPUTS.get(name, [name]) if rollup not in names)
+    return names
+
+
+def filter_key(filters):
+    """Short text form of a filters dict, for cache keys."""
+    return ";".join(f"{dimension}={','.join(map(str, value))}" for dimension, value in sorted(filters.items()))
+
+
+class _Rollup:
+    """A date-sorted rollup frame with the arrays its filters slice and mask on."""
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.days = self.dated = None
+        if "date" in self.df.columns:
+            # Undated (NaT) rows are sorted last, after every date range.
+            self.days = self.df["date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+            self.dated = int(np.count_nonzero(~np.isnat(self.days)))
+        self.category_codes = self.category_sets = None
+        if "categories" in self.df.columns:
+            self.category_codes, uniques = pd.factorize(self.df["categories"])
+            self.category_sets = [set(value.split(CATEGORY_SEPARATOR)) if value else set() for value in uniques]
+
+    def rows(self, filters):
+        """Rows within the date range, then those matching the category and venue filters."""
+        start, stop = 0, len(self.df)
+        date_range = filters.get("date")
+        if date_range is not None and self.days is not None:
+            first, last = date_range
+            # Only dated rows when a range is set, even an open-ended one.
+            stop = self.dated
+            if first is not None:
+                start = int(np.searchsorted(self.days[:stop], np.datetime64(first, "D"), side="left"))
+            if last is not None:
+                stop = int(np.searchsorted(self.days[:stop], np.datetime64(last, "D"), side="right"))
+        mask = np.ones(max(stop - start, 0), dtype=bool)
+        categories = filters.get("category")
+        if categories is not None and self.category_codes is not None:
+            selected = set(categories)
+            overlaps = np.array([bool(category_set & selected) for category_set in self.category_sets] + [False])
+            mask &= overlaps[self.category_codes[start:stop]]
+        venues = filters.get("venue")
+        if venues is not None and "venue_id" in self.df.columns:
+            mask &= np.isin(self.df["venue_id"].to_numpy()[start:stop], np.asarray(venues, dtype="float64"))
+        rows = self.df.iloc[start:stop]
+        return rows if mask.all() else rows[mask]
+
+
+# --- Filtered Metrics ---
+# Same names and columns as the snapshot metrics, so the same chart builders draw them.
+
+def _event_status_counts(rows):
+    counts = rows("rollup_events").groupby("status", sort=False)["count"].sum()
+    counts = counts[counts > 0].reset_index()
+    counts.columns = ["Status", "Count"]
+    return _sorted(counts, "Status", "Count")
+
+
+def _events_by_category(rows, filters):
+    events = rows("rollup_events")
+    per_set = events.groupby("categories", sort=False)["count"].sum()
+    per_category = {}
+    for categories, count in per_set.items():
+        for category in categories.split(CATEGORY_SEPARATOR) if categories else []:
+            per_category[category] = per_category.get(category, 0) + count
+    if "category" in filters:
+        per_category = {category: count for category, count in per_category.items() if category in filters["category"]}
+    counts = pd.DataFrame({"Category": list(per_category), "Count": list(per_category.values())})
+    return _sorted(counts, "Category", "Count")
+
+
+def _ticket_price_histogram(rows):
+    prices = rows("rollup_ticket_prices")
+    if prices.empty:
+        return histogram_frame(0.0, 0.0, {}).iloc[0:0]
+    bucket_counts = prices.groupby("bucket")["count"].sum()
+    # Bins keep the snapshot-wide edges, so filtered histograms are comparable.
+    return histogram_frame(float(prices["lo"].iloc[0]), float(prices["hi"].iloc[0]),
+                           dict(zip(bucket_counts.index.astype(int), bucket_counts.to_numpy())))
+
+
+def _monthly_new_users(rows):
+    daily = rows("daily_new_users")
+    monthly = daily["count"].groupby(daily["date"].dt.strftime("%Y-%m").to_numpy()).sum().sort_index()
+    return pd.DataFrame({"month": monthly.index, "count": monthly.to_numpy()})
+
+
+def _venue_booking_status_counts(rows):
+    counts = rows("rollup_venue_bookings").groupby("status", sort=False)["count"].sum()
+    counts = counts[counts > 0].reset_index()
+    counts.columns = ["Status", "Count"]
+    return _sorted(counts, "Status", "Count")
+
+
+FILTERED_METRICS = {
+    "total_events": lambda index, rows, filters: _scalar(int(rows("rollup_events")["count"].sum())),
+    "event_status_counts": lambda index, rows, filters: _event_status_counts(rows),
+    "events_by_category": lambda index, rows, filters: _events_by_category(rows, filters),
+    "top_events_by_tickets_sold": lambda index, rows, filters: index.query("top_events_by_tickets_sold", filters),
+    "ticket_price_histogram": lambda index, rows, filters: _ticket_price_histogram(rows),
+    "total_users": lambda index, rows, filters: _scalar(int(rows("daily_new_users")["count"].sum())),
+    "daily_new_users": lambda index, rows, filters: rows("daily_new_users"),
+    "monthly_new_users": lambda index, rows, filters: _monthly_new_users(rows),
+    "total_tips": lambda index, rows, filters: _scalar(float(rows("daily_tips")["amount"].sum())),
+    "daily_tips": lambda index, rows, filters: rows("daily_tips"),
+    "top_tipped_performers": lambda index, rows, filters: index.query("top_tipped_performers", filters),
+    "daily_transactions": lambda index, rows, filters: rows("daily_transactions"),
+    "venue_booking_status_counts": lambda index, rows, filters: _venue_booking_status_counts(rows),
+}
+
+
+class RollupIndex:
+    """
+    The rollups of one snapshot, indexed for filtering.
+
+    Rollups are small pre-aggregates (daily counts and sums per status,
+    category set or venue) built once per snapshot by either metrics backend.
+    Here they are sorted by date once, so a filtered metric is a binary search
+    for the date range plus a mask over the matching rows: its cost depends on
+    the rollup size, not on the size of the raw tables. QUERY_METRICS are
+    queried from the database instead, once per filter.
+    """
+
+    def __init__(self, metrics, db_params=db_connection_params):
+        self.metrics = metrics
+        self.db_params = db_params
+        self._rollups = {}
+        self._queries = {}  # (metric name, filter key) -> DataFrame
+        self._lock = threading.Lock()
+
+    def frame(self, name):
+        """The snapshot metric called name, or an empty frame if it is missing."""
+        return self.metrics.get(name, pd.DataFrame(columns=["date"]))
+
+    def _rollup(self, name):
+        with self._lock:
+            if name not in self._rollups:
+                df = self.frame(name)
+                if "date" in df.columns and not df.empty:
+                    df = df.assign(date=pd.to_datetime(df["date"])).sort_values(
+                        "date", na_position="last", kind="mergesort")
+                self._rollups[name] = _Rollup(df)
+            return self._rollups[name]
+
+    def query(self, name, filters):
+        """The filtered query of metric name, run on first use for these filters."""
+        key = (name, filter_key(filters))
+        with self._lock:
+            if key in self._queries:
+                return self._queries[key]
+        result = fetch_filtered_sql_metric(self.db_params, name, filters)
+        with self._lock:
+            self._queries[key] = result
+        return result
+
+    def filtered_metrics(self, metric_names, filters):
+        """Computes each of metric_names with filters applied. Returns {name: DataFrame}."""
+        rows = lambda name: self._rollup(name).rows(filters)
+        results = {}
+        for name in metric_names:
+            try:
+                results[name] = FILTERED_METRICS[name](self, rows, filters).reset_index(drop=True)
+            except Exception as error:
+                print(f"Error filtering metric '{name}': {error}")
+        return results
+
+    def category_options(self):
+        """Category names found in the snapshot, sorted."""
+        sets = self._rollup("rollup_events").category_sets or []
+        return sorted(set().union(*sets))
+
+    def venue_options(self):
+        """(venue id, label) of every venue with bookings, sorted by label."""
+        bookings = self.frame("rollup_venue_bookings")
+        if "venue_id" not in bookings.columns:
+            return []
+        names = self.frame("venue_names")
+        labels = dict(zip(names["venue_id"], names["venue_name"])) if "venue_name" in names.columns else {}
+        venues = [(int(venue_id), labels.get(venue_id) or f"Venue {int(venue_id)}")
+                  for venue_id in bookings["venue_id"].dropna().unique()]
+        return sorted(venues, key=lambda venue: (str(venue[1]), venue[0]))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def rollup_index(snapshot):
+    """The RollupIndex of a snapshot, built on first use and reused while it is current."""
+    key = (snapshot["version"], snapshot["created_at"])
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes.clear()  # Only the current snapshot is ever filtered
+            _indexes[key] = RollupIndex(snapshot["metrics"])
+        return _indexes[key]
@@ -0,0 +1,210 @@
+import os
+import random
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, every process runs its own change feed
+    fcntl = None
+
+# --- Refresh Scheduler Settings ---
+REFRESH_INTERVAL_SECONDS = 60
+# How often workers that are not refreshing check for a newly published snapshot.
+POLL_INTERVAL_SECONDS = 5
+# Each sleep is randomised by up to this fraction so workers do not wake in lockstep.
+JITTER_FRACTION = 0.1
+# Retry delays after failed refreshes: BACKOFF_BASE_SECONDS, doubling up to BACKOFF_MAX_SECONDS.
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 300
+
+# --- Change Feed Scheduler Settings ---
+# Full refreshes still run this often in change-feed mode, as a safety net.
+FULL_REFRESH_SECONDS = 15 * 60
+# Least time between two refreshes of changed tables; changes seen in between
+# are collected and refreshed together, so busy tables cannot keep the database busy.
+FEED_MIN_REFRESH_SECONDS = 5
+# How often workers not running the change feed check for a newly published snapshot.
+FEED_POLL_INTERVAL_SECONDS = 1
+# Held by the one worker that runs the change feed.
+FEED_LOCK_FILE = "change-feed.lock"
+
+
+class RefreshFailed(Exception):
+    """Raised when a refresh produced no data, e.g. because the database was unreachable."""
+
+
+class RefreshScheduler:
+    """
+    Keeps a SnapshotStore up to date from a background thread.
+
+    Every worker runs one. Whichever worker first finds the snapshot older
+    than the refresh interval refreshes it (the store's lock keeps that to one
+    at a time); the others just pick up the new version. Dash callbacks never
+    query the database, they only read store.metrics.
+    """
+
+    def __init__(self, store, refresh, interval=REFRESH_INTERVAL_SECONDS, poll_interval=POLL_INTERVAL_SECONDS,
+                 jitter=JITTER_FRACTION, backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS):
+        self.store = store
+        self.refresh = refresh
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the background thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="snapshot-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_or_fail(self, *args):
+        metrics = self.refresh(*args)
+        if not metrics:
+            raise RefreshFailed("refresh returned no data")
+        return metrics
+
+    def retry_delay(self, failures):
+        """Seconds to wait after the given number of failures in a row: BACKOFF_BASE_SECONDS, doubling."""
+        return min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+
+    def _backoff(self, error):
+        """
+        Returns how long to wait after a failure. Failed refreshes are recorded
+        in the store, so this waits until the retry time shared by all workers;
+        other failures (e.g. a lost change feed connection) back off locally.
+        """
+        failures, retry_at = self.store.backoff()
+        if retry_at <= time.time():
+            self.failures += 1
+            failures, retry_at = self.failures, time.time() + self.retry_delay(self.failures)
+        delay = max(retry_at - time.time(), 0)
+        print(f"Snapshot refresh failed ({failures} in a row), retrying in {delay:.0f}s: {error}")
+        return delay
+
+    def run_once(self):
+        """
+        Refreshes the snapshot if it is due, otherwise picks up the latest one.
+        Returns the number of seconds to wait before the next call.
+        """
+        try:
+            if self.store.refresh_if_stale(self._refresh_or_fail, self.interval, retry_delay=self.retry_delay):
+                print(f"Snapshot v{self.store.version} loaded at {time.strftime('%Y-%m-%d %H:%M:%S')}.")
+            self.failures = 0
+        except Exception as error:
+            return self._backoff(error)
+        # Still stale: another worker is refreshing or all are backing off, so check back later
+        return min(self.poll_interval, max(self.interval - self.store.age(), 0)) or self.poll_interval
+
+    def _run(self):
+        delay = 0
+        while not self._stop.wait(delay):
+            delay = self.run_once()
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+
+
+class ChangeFeedScheduler(RefreshScheduler):
+    """
+    Keeps a SnapshotStore up to date from a ChangeFeed instead of a timer.
+
+    One worker, whichever holds the feed lock, keeps the feed's connection
+    open. When tables change it calls refresh(changed table names) and merges
+    the recomputed metrics into the snapshot, so only charts reading those
+    tables get new input hashes. Refreshes run at most every
+    min_refresh_interval seconds; tables that change in between are refreshed
+    together at the end of it. The other workers only pick up new versions;
+    one of them takes over the feed if the leading worker exits. Everything is
+    refreshed when the feed (re)connects, since changes may have been missed
+    meanwhile, and every interval seconds as a safety net.
+    """
+
+    def __init__(self, store, refresh, feed, interval=FULL_REFRESH_SECONDS,
+                 poll_interval=FEED_POLL_INTERVAL_SECONDS, min_refresh_interval=FEED_MIN_REFRESH_SECONDS, **kwargs):
+        super().__init__(store, refresh, interval=interval, poll_interval=poll_interval, **kwargs)
+        self.feed = feed
+        self.min_refresh_interval = min_refresh_interval
+        self.last_refresh = None
+        self.last_full_refresh = None
+        self.pending = None  # Changed tables not yet refreshed
+        self._lock_file = None
+
+    def _lead(self):
+        """Returns True if this worker runs the change feed, taking the feed lock if it is free."""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(self.store.directory, FEED_LOCK_FILE), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False  # Another worker runs the feed
+        self._lock_file = lock_file  # Kept open, so the lock is held until this process exits
+        return True
+
+    def _refresh_all(self):
+        self.last_refresh = time.monotonic()
+        metrics = self._refresh_or_fail()
+        self.pending = None
+        self.last_full_refresh = time.monotonic()
+        return metrics
+
+    def _refresh_changed(self, tables):
+        self.last_refresh = time.monotonic()
+        metrics = self._refresh_or_fail(tables)
+        self.pending = None
+        return metrics
+
+    def _refresh_wait(self):
+        """Seconds until a refresh of changed tables is allowed again."""
+        if self.last_refresh is None:
+            return 0
+        return max(self.last_refresh + self.min_refresh_interval - time.monotonic(), 0)
+
+    def _full_refresh_due(self):
+        return (self.last_full_refresh is None or
+                time.monotonic() - self.last_full_refresh >= self.interval)
+
+    def run_once(self):
+        """
+        Waits for changes (up to the feed's probe interval) and refreshes what
+        they affect, or, on workers not running the feed, picks up the latest
+        snapshot. Returns the number of seconds to wait before the next call.
+        """
+        if not self._lead():
+            if self.store.load():
+                print(f"Snapshot v{self.store.version} loaded at {time.strftime('%Y-%m-%d %H:%M:%S')}.")
+            return self.poll_interval
+        try:
+            changed = self.feed.changes()
+            if changed is None:
+                self.last_full_refresh = None  # Changes may have been missed while disconnected
+            if self._full_refresh_due():
+                published = self.store.refresh_if_stale(self._refresh_all, 0, retry_delay=self.retry_delay)
+                reason = "full refresh"
+            elif changed or self.pending:
+                # Tables stay pending until a refresh covering them succeeds, so failed ones are retried.
+                self.pending = (self.pending or set()) | changed
+                wait = self._refresh_wait()
+                if wait > 0:
+                    return wait  # Collect more changes; notifications queue on the connection meanwhile
+                tables = self.pending
+                published = self.store.refresh_if_stale(lambda: self._refresh_changed(tables), 0, partial=True,
+                                                        retry_delay=self.retry_delay)
+                reason = f"{', '.join(sorted(tables))} changed"
+            else:
+                published = False
+            if published:
+                print(f"Snapshot v{self.store.version} loaded at {time.strftime('%Y-%m-%d %H:%M:%S')} ({reason}).")
+            self.failures = 0
+        except Exception as error:
+            return self._backoff(error)
+        return 0  # The feed itself waits between probes (or for the next notification)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+import time
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, each process refreshes on its own
+    fcntl = None
+
+# --- Snapshot Store Settings ---
+# Directory shared by all gunicorn workers on this host. It must be private to
+# the user the app runs as: snapshots are unpickled from it.
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT_DIR",
+                              os.path.join(tempfile.gettempdir(), "beatbnk-dashboard"))
+SNAPSHOT_FILE = "snapshot.pkl"
+LOCK_FILE = "refresh.lock"
+# Failures in a row and the earliest next retry, shared so every worker backs off together.
+BACKOFF_FILE = "refresh-backoff.json"
+
+
+def empty_snapshot():
+    return {"version": 0, "created_at": None, "metrics": {}, "hashes": {}}
+
+
+def frame_hash(df):
+    """Content hash of a DataFrame, independent of its index."""
+    digest = hashlib.sha1(",".join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def ensure_private_directory(directory):
+    """
+    Creates directory with access for this user only, or checks that an
+    existing one is a real directory owned by this user (tightening its mode
+    if needed). Raises PermissionError otherwise: anyone able to write there
+    could plant a snapshot that runs code as the app when it is loaded.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "geteuid"):
+        return  # Windows: the per-user temp directory's ACLs apply
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid():
+        raise PermissionError(f"Snapshot directory '{directory}' is not a directory owned by this user; "
+                              f"set DASHBOARD_SNAPSHOT_DIR to a private directory.")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+
+def input_hashes(snapshot, metric_names):
+    """Content hashes of the named metrics in a snapshot, for keying anything derived from them."""
+    hashes = snapshot.get("hashes", {})
+    return [hashes.get(name, f"v{snapshot['version']}") for name in metric_names]
+
+
+class SnapshotStore:
+    """
+    Shares the latest metrics snapshot between worker processes through a file.
+
+    One process at a time (whichever holds the refresh lock) queries the
+    database and publishes a new snapshot version. Publishing writes to a
+    temporary file and renames it into place, so readers always see either the
+    old or the new snapshot in full. Every other process only re-reads the file
+    when it has been replaced.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        ensure_private_directory(directory)
+        self.directory = directory
+        self.path = os.path.join(directory, SNAPSHOT_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        self.backoff_path = os.path.join(directory, BACKOFF_FILE)
+        self.snapshot = empty_snapshot()
+        self._file_id = None  # (inode, mtime) of the file self.snapshot was read from
+
+    @property
+    def version(self):
+        return self.snapshot["version"]
+
+    @property
+    def metrics(self):
+        return self.snapshot["metrics"]
+
+    def age(self):
+        """Seconds since the current snapshot was published (infinite if there is none)."""
+        if self.snapshot["created_at"] is None:
+            return float("inf")
+        return time.time() - self.snapshot["created_at"]
+
+    def load(self):
+        """
+        Loads the published snapshot if the file was replaced since the last load.
+        Returns True if a new version was loaded.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id == self._file_id:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError) as error:
+            print(f"Could not read snapshot '{self.path}': {error}")
+            return False
+        self._file_id = file_id
+        changed = snapshot["version"] != self.snapshot["version"]
+        self.snapshot = snapshot
+        return changed
+
+    def publish(self, metrics, partial=False):
+        """
+        Atomically replaces the shared snapshot with a new version holding metrics.
+        Metrics of the current snapshot missing from metrics (because they failed
+        to compute) keep their last good data. With partial, metrics only holds
+        recomputed metrics; if none of them changed, nothing is published.
+        Returns True if a new version was published.
+        """
+        hashes = {name: frame_hash(df) for name, df in metrics.items()}
+        if partial and all(self.snapshot["hashes"].get(name) == digest for name, digest in hashes.items()):
+            return False  # Recomputed, but nothing any chart shows has changed
+        kept = [name for name in self.snapshot["metrics"] if name not in metrics]
+        if kept and not partial:
+            print(f"Keeping the last good data of metrics that failed: {', '.join(kept)}")
+        metrics = {**self.snapshot["metrics"], **metrics}
+        hashes = {**self.snapshot["hashes"], **hashes}
+        snapshot = {
+            "version": self.snapshot["version"] + 1,
+            "created_at": time.time(),
+            "metrics": metrics,
+            "hashes": hashes,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._file_id = (stat.st_ino, stat.st_mtime_ns)
+        self.snapshot = snapshot
+        return True
+
+    def backoff(self):
+        """
+        Returns (failed refreshes in a row, time before which no process should
+        retry), as recorded by whichever process refreshed last.
+        """
+        try:
+            with open(self.backoff_path) as f:
+                state = json.load(f)
+            return int(state["failures"]), float(state["retry_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0, 0.0
+
+    def _record_backoff(self, failures, retry_at):
+        if failures == 0:
+            try:
+                os.remove(self.backoff_path)
+            except FileNotFoundError:
+                pass
+            return
+        tmp_path = f"{self.backoff_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"failures": failures, "retry_at": retry_at}, f)
+        os.replace(tmp_path, self.backoff_path)
+
+    def refresh_if_stale(self, refresh, max_age, partial=False, retry_delay=None):
+        """
+        Picks up any snapshot another process published and, if the latest one is
+        older than max_age seconds, calls refresh() and publishes its metrics
+        (merged into the current ones with partial, see publish()).
+        Only one process refreshes at a time; the others keep the snapshot they have.
+
+        If retry_delay is given, a refresh that raises or returns nothing is
+        recorded in the shared backoff state, and no process refreshes again
+        until retry_delay(failures in a row) seconds have passed.
+        Returns True if the snapshot version changed.
+        """
+        changed = self.load()
+        if self.age() < max_age or self.backoff()[1] > time.time():
+            return changed
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return changed  # Another worker is refreshing right now
+            try:
+                # The previous lock holder may have published while we waited.
+                changed = self.load() or changed
+                failures, retry_at = self.backoff()
+                if self.age() < max_age or retry_at > time.time():
+                    return changed
+                try:
+                    metrics = refresh()
+                except Exception:
+                    if retry_delay is not None:
+                        self._record_backoff(failures + 1, time.time() + retry_delay(failures + 1))
+                    raise
+                if not metrics:
+                    if retry_delay is not None:
+                        self._record_backoff(failures + 1, time.time() + retry_delay(failures + 1))
+                    return changed  # Keep the last good snapshot if the refresh failed
+                if failures:
+                    self._record_backoff(0, 0.0)
+                return self.publish(metrics, partial) or changed
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from downsampling import MAX_POINTS, choose_bucket, downsample, window_from_relayout
+
+CURRENT = ("2024-01-01", "2024-02-01")
+
+
+@pytest.mark.parametrize("relayout, expected", [
+    (None, CURRENT),
+    ({}, CURRENT),
+    ({"autosize": True}, CURRENT),
+    ({"yaxis.range[0]": 0, "yaxis.range[1]": 10}, CURRENT),
+    ({"xaxis.autorange": True}, None),
+    ({"xaxis.range[0]": "2024-03-02 13:45:00.5", "xaxis.range[1]": "2024-03-09 02:00"}, ("2024-03-02", "2024-03-10")),
+    ({"xaxis.range": ["2024-03-02", "2024-03-09"]}, ("2024-03-02", "2024-03-09")),
+    ({"xaxis.range[0]": "not a date", "xaxis.range[1]": "2024-03-09"}, CURRENT),
+])
+def test_window_from_relayout(relayout, expected):
+    assert window_from_relayout(relayout, CURRENT) == expected
+
+
+@pytest.mark.parametrize("days, frequency", [
+    (1, "D"),
+    (MAX_POINTS, "D"),
+    (MAX_POINTS + 1, "W"),
+    (MAX_POINTS * 7, "W"),
+    (MAX_POINTS * 7 + 1, "M"),
+    (100 * 365, "M"),
+])
+def test_choose_bucket(days, frequency):
+    assert choose_bucket(days)[0] == frequency
+
+
+def _daily(days):
+    dates = pd.date_range("2022-01-01", periods=days, freq="D")
+    return pd.DataFrame({"date": dates, "count": range(days)})
+
+
+def test_short_series_is_kept_daily():
+    df = _daily(MAX_POINTS)
+    result, label = downsample(df, "date", "count")
+    assert label == "Daily"
+    pd.testing.assert_frame_equal(result, df)
+
+
+def test_long_series_is_summed_into_weeks():
+    df = _daily(3 * 365)
+    result, label = downsample(df, "date", "count")
+    assert label == "Weekly"
+    assert len(result) <= MAX_POINTS
+    assert result["count"].sum() == df["count"].sum()
+    assert (result["date"].dt.dayofweek == 0).all()  # Weeks start on Monday
+
+
+def test_window_picks_the_bucket_for_the_visible_range():
+    df = _daily(3 * 365)
+    result, label = downsample(df, "date", "count", window=("2023-03-01", "2023-03-31"))
+    assert label == "Daily"
+    # One window width of margin either side of the visible range.
+    assert result["date"].min() == pd.Timestamp("2023-01-30")
+    assert result["date"].max() == pd.Timestamp("2023-04-30")
+
+
+def test_wide_window_is_bucketed_coarser():
+    df = _daily(3 * 365)
+    result, label = downsample(df, "date", "count", window=("2022-01-01", "2023-06-30"))
+    assert label == "Weekly"
+    assert len(result) <= MAX_POINTS
@@ -0,0 +1,137 @@
+import pandas as pd
+import pytest
+
+import database
+from database import IncrementalSync, SyncFailed, merge_rows
+
+
+class FakeDatabase:
+    """Tables held as DataFrames, served the way fetch_table reads them."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.fetches = []  # (table name, since) per fetch_table call
+        self.failing = set()
+
+    def fetch_table(self, cursor, table_name, columns=None, since=None):
+        self.fetches.append((table_name, since))
+        if table_name in self.failing:
+            raise RuntimeError(f"cannot read {table_name}")
+        df = self.tables[table_name]
+        if since is not None:
+            column, value = since
+            df = df[df[column] >= value]
+        return df.reset_index(drop=True)
+
+    def fetch_parallel(self, db_params, jobs):
+        results, errors = {}, {}
+        for name, job in jobs.items():
+            try:
+                results[name] = job(None)
+            except Exception as error:
+                errors[name] = error
+        return results, errors
+
+
+def _events(ids, names, updated):
+    return pd.DataFrame({"id": ids, "eventName": names, "updatedAt": pd.to_datetime(updated)})
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDatabase({
+        "events": _events([1, 2, 3], ["a", "b", "c"], ["2024-01-01", "2024-01-02", "2024-01-03"]),
+        "venues": pd.DataFrame({"id": [1], "name": ["Hall"]}),
+    })
+    monkeypatch.setattr(database, "fetch_table", fake.fetch_table)
+    monkeypatch.setattr(database, "fetch_parallel", fake.fetch_parallel)
+    return fake
+
+
+def test_merge_rows_replaces_rows_with_the_same_key():
+    cached = _events([1, 2], ["a", "b"], ["2024-01-01", "2024-01-02"])
+    delta = _events([2, 3], ["b2", "c"], ["2024-01-05", "2024-01-05"])
+    merged = merge_rows(cached, delta)
+    assert merged.sort_values("id")["eventName"].tolist() == ["a", "b2", "c"]
+    assert merge_rows(cached, delta.iloc[0:0]) is cached
+
+
+def test_first_refresh_fetches_everything_and_sets_watermarks(db):
+    sync = IncrementalSync({}, ["events", "venues"])
+    data = sync.refresh()
+    assert db.fetches == [("events", None), ("venues", None)]
+    assert len(data["events"]) == 3
+    assert sync.watermarks["events"] == ("updatedAt", pd.Timestamp("2024-01-03").to_pydatetime())
+    # Tables without a date column fall back to their primary key.
+    assert sync.watermarks["venues"] == ("id", 1)
+
+
+def test_refresh_fetches_rows_past_the_watermark_and_merges_them(db):
+    sync = IncrementalSync({}, ["events"])
+    sync.refresh()
+    db.tables["events"] = _events([1, 2, 3, 4], ["a", "b2", "c", "d"],
+                                  ["2024-01-01", "2024-01-04", "2024-01-03", "2024-01-04"])
+    db.fetches.clear()
+
+    data = sync.refresh()
+
+    assert db.fetches == [("events", ("updatedAt", pd.Timestamp("2024-01-03").to_pydatetime()))]
+    events = data["events"].sort_values("id")
+    assert events["id"].tolist() == [1, 2, 3, 4]
+    assert events["eventName"].tolist() == ["a", "b2", "c", "d"]
+    assert sync.watermarks["events"][1] == pd.Timestamp("2024-01-04").to_pydatetime()
+
+
+def test_deletes_are_only_picked_up_on_a_full_reconcile(db, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+    sync = IncrementalSync({}, ["events"], full_reconcile_interval=60)
+    sync.refresh()
+    db.tables["events"] = db.tables["events"][db.tables["events"]["id"] != 2]
+
+    clock[0] += 30
+    assert sorted(sync.refresh()["events"]["id"]) == [1, 2, 3]
+
+    clock[0] += 30
+    db.fetches.clear()
+    assert sorted(sync.refresh()["events"]["id"]) == [1, 3]
+    assert db.fetches == [("events", None)]
+
+
+def test_only_requested_tables_are_synced(db):
+    sync = IncrementalSync({}, ["events", "venues"])
+    sync.refresh()
+    db.fetches.clear()
+    data = sync.refresh(["venues"])
+    assert [table_name for table_name, _ in db.fetches] == ["venues"]
+    assert set(data) == {"events", "venues"}
+
+
+def test_failed_tables_keep_cached_rows_and_are_retried_in_full(db, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+    sync = IncrementalSync({}, ["events", "venues"], full_reconcile_interval=60)
+    sync.refresh()
+    db.failing.add("venues")
+
+    clock[0] += 60
+    data = sync.refresh()
+    assert len(data["venues"]) == 1
+    assert set(sync.errors) == {"venues"}
+
+    db.fetches.clear()
+    sync.refresh()
+    # The events reconcile succeeded, so only the failed table is fetched in full again.
+    assert db.fetches == [("events", ("updatedAt", pd.Timestamp("2024-01-03").to_pydatetime())), ("venues", None)]
+
+    db.failing.clear()
+    sync.refresh()
+    assert sync.errors == {}
+
+
+def test_refresh_raises_when_no_table_could_be_synced(db):
+    sync = IncrementalSync({}, ["events", "venues"])
+    db.failing.update({"events", "venues"})
+    with pytest.raises(SyncFailed):
+        sync.refresh()
+    assert sync.data == {}
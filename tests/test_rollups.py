@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+import rollups
+from benchmarks.synthetic import generate_tables
+from metrics import compute_pandas_metrics
+from rollups import FILTERED_METRICS, QUERY_METRICS, RollupIndex, filter_key, filters_from_controls
+
+ALL_TIME = {"date": ("1900-01-01", "2100-12-31")}
+
+
+@pytest.fixture(scope="module")
+def metrics():
+    return compute_pandas_metrics(generate_tables(2000))
+
+
+@pytest.fixture
+def queries(monkeypatch, metrics):
+    """Answers QUERY_METRICS from the unfiltered metrics instead of the database, recording each query."""
+    calls = []
+
+    def fetch(db_params, name, filters):
+        calls.append((name, filter_key(filters)))
+        return metrics[name]
+
+    monkeypatch.setattr(rollups, "fetch_filtered_sql_metric", fetch)
+    return calls
+
+
+@pytest.mark.parametrize("name", sorted(set(FILTERED_METRICS) - QUERY_METRICS))
+def test_all_time_filter_matches_unfiltered_metric(metrics, name):
+    filtered = RollupIndex(metrics).filtered_metrics([name], ALL_TIME)[name]
+    pd.testing.assert_frame_equal(filtered.reset_index(drop=True), metrics[name].reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_every_category_matches_unfiltered_event_counts(metrics):
+    index = RollupIndex(metrics)
+    filtered = index.filtered_metrics(["events_by_category"], {"category": tuple(index.category_options())})
+    pd.testing.assert_frame_equal(filtered["events_by_category"], metrics["events_by_category"], check_dtype=False)
+
+
+def test_date_filter_narrows_counts(metrics):
+    index = RollupIndex(metrics)
+    filters = filters_from_controls("2024-01-01T00:00:00", "2024-01-31", None, None)
+    filtered = index.filtered_metrics(["total_users", "daily_new_users"], filters)
+    daily = filtered["daily_new_users"]
+    assert daily["date"].min() >= pd.Timestamp("2024-01-01") and daily["date"].max() <= pd.Timestamp("2024-01-31")
+    assert filtered["total_users"].iloc[0, 0] == daily["count"].sum()
+    assert 0 < daily["count"].sum() < metrics["total_users"].iloc[0, 0]
+
+
+def test_queried_metrics_are_cached_per_filter(metrics, queries):
+    index = RollupIndex(metrics)
+    for _ in range(2):
+        index.filtered_metrics(sorted(QUERY_METRICS), ALL_TIME)
+    index.filtered_metrics(["top_tipped_performers"], {"date": ("2024-01-01", None)})
+    assert sorted(queries) == sorted([(name, filter_key(ALL_TIME)) for name in QUERY_METRICS] +
+                                     [("top_tipped_performers", "date=2024-01-01,None")])
+